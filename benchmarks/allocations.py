@@ -0,0 +1,113 @@
+# @FileName: allocations.py
+# @Date    : 2026/10/18-19:40
+# @Author  : vank
+# @Project : vank
+"""
+统计每个请求的内存分配
+完整的WSGI调用包括创建Request、路由匹配、读取请求头与cookie、创建Response并迭代响应体 输出:
+    - 每个请求的耗时
+    - 使用tracemalloc统计的单个请求的内存峰值
+    - Request、Response和Route实例本身的大小
+运行: python benchmarks/allocations.py --requests 10000
+"""
+import os
+import sys
+import time
+import argparse
+import tracemalloc
+from io import BytesIO
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROJECT_SETTING', 'settings')
+
+from vank.core.context import request  # noqa: E402
+from vank.core.app import Application  # noqa: E402
+from vank.core.http.request import Request  # noqa: E402
+from vank.core.http.response import ResponseJson, ResponsePlain  # noqa: E402
+
+
+def build_application():
+    application = Application()
+
+    @application.get('/users/{uid:int}')
+    def user(uid):
+        return ResponseJson({'id': uid, 'agent': request.headers.get('USER_AGENT'), 'cookies': len(request.cookies)})
+
+    @application.get('/ping')
+    def ping():
+        return ResponsePlain('pong')
+
+    return application
+
+
+def build_environ(path):
+    return {
+        'REQUEST_METHOD': 'GET',
+        'PATH_INFO': path,
+        'QUERY_STRING': '',
+        'SERVER_NAME': 'localhost',
+        'SERVER_PORT': '5000',
+        'wsgi.input': BytesIO(),
+        'HTTP_HOST': 'localhost:5000',
+        'HTTP_USER_AGENT': 'Mozilla/5.0 (X11; Linux x86_64) benchmark',
+        'HTTP_ACCEPT': 'application/json',
+        'HTTP_COOKIE': 'sessionid=abc; csrftoken=def; _ga=GA1.2.3',
+    }
+
+
+def start_response(status, headers):
+    pass
+
+
+def instance_size(obj) -> int:
+    """
+    实例本身以及实例__dict__的大小
+    使用__slots__的类即使保留了__dict__ 在添加自定义属性之前也不会创建
+    """
+    size = sys.getsizeof(obj)
+    if not hasattr(type(obj), '__slots__'):
+        size += sys.getsizeof(obj.__dict__)
+    return size
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Per-request allocation benchmark')
+    parser.add_argument('--requests', type=int, default=10000, help='Number of requests')
+    options = parser.parse_args()
+    application = build_application()
+    environs = [build_environ(f'/users/{index}' if index % 2 else '/ping') for index in range(options.requests)]
+    # 预热 排除第一次请求时的缓存与导入
+    for environ in environs[:100]:
+        b''.join(application(dict(environ), start_response))
+    start = time.perf_counter()
+    for environ in environs:
+        b''.join(application(environ, start_response))
+    elapsed = time.perf_counter() - start
+    print(f'requests                : {options.requests}')
+    print(f'us/request              : {elapsed / options.requests * 1e6:.2f}')
+    route = next(application.router.routes)
+    print(f'Request instance bytes  : {instance_size(Request(build_environ("/ping")))}')
+    print(f'Response instance bytes : {instance_size(ResponsePlain("pong"))}')
+    print(f'Route instance bytes    : {instance_size(route)}')
+    peak = measure_peak(application, environs[:1000])
+    print(f'peak bytes/request      : {peak:.1f}')
+
+
+def measure_peak(application, environs) -> float:
+    """
+    逐个请求统计内存的峰值 即单个请求在处理过程中最多占用的内存
+    """
+    tracemalloc.start()
+    total = 0
+    for environ in environs:
+        environ = dict(environ, **{'wsgi.input': BytesIO()})
+        tracemalloc.reset_peak()
+        start = tracemalloc.get_traced_memory()[0]
+        b''.join(application(environ, start_response))
+        total += tracemalloc.get_traced_memory()[1] - start
+    tracemalloc.stop()
+    return total / len(environs)
+
+
+if __name__ == '__main__':
+    main()
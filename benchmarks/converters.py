@@ -0,0 +1,55 @@
+# @FileName: converters.py
+# @Date    : 2026/10/18-15:20
+# @Author  : vank
+# @Project : vank
+"""
+对比路由转换器的正则匹配与原生匹配(match_segment)的耗时
+没有提供原生匹配方法的转换器(例如float、uuid 它们的耗时主要在于类型转换)只输出正则匹配的耗时
+运行: python benchmarks/converters.py
+"""
+import os
+import re
+import sys
+import timeit
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROJECT_SETTING', 'settings')
+
+from vank.core.routing.route import get_converters  # noqa: E402
+
+SAMPLES = {
+    'int': ['12345', '0', 'abc'],
+    'float': ['3.1415', '42', '1.x'],
+    'str': ['hello-world', 'user'],
+    'uuid': ['c3e5f6a0-1111-2222-3333-444455556666', 'not-a-uuid'],
+    'path': ['css/site/main.css', 'a'],
+}
+
+
+def regex_match(pattern, converter, value):
+    res = pattern.fullmatch(value)
+    return converter.convert_to_python(value) if res else None
+
+
+def main(number=200000):
+    converters = get_converters()
+    print(f'{"converter":<10}{"regex (ns)":>14}{"native (ns)":>14}{"speedup":>10}')
+    for name, values in SAMPLES.items():
+        converter = converters[name]
+        pattern = re.compile(converter.regex)
+        per_call = number * len(values) / 1e9
+        regex_time = min(timeit.repeat(
+            lambda: [regex_match(pattern, converter, value) for value in values], number=number, repeat=3
+        ))
+        if converter.match_segment is None:
+            print(f'{name:<10}{regex_time / per_call:>14.1f}{"-":>14}{"-":>10}')
+            continue
+        native_time = min(timeit.repeat(
+            lambda: [converter.match_segment(value) for value in values], number=number, repeat=3
+        ))
+        print(f'{name:<10}{regex_time / per_call:>14.1f}{native_time / per_call:>14.1f}'
+              f'{regex_time / native_time:>9.2f}x')
+
+
+if __name__ == '__main__':
+    main()
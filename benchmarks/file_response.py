@@ -0,0 +1,93 @@
+# @FileName: file_response.py
+# @Date    : 2026/10/18-21:30
+# @Author  : vank
+# @Project : vank
+"""
+对比ResponseFile的几种发送方式
+通过开发服务器下载同一个文件 输出每次下载的耗时和吞吐量:
+    - sendfile: 服务器提供wsgi.file_wrapper 由os.sendfile在内核中复制
+    - chunks-<size>: 不提供wsgi.file_wrapper ResponseFile按块读取 分别使用2KB(原来的块大小)和FILE_CHUNK_SIZE
+运行: python benchmarks/file_response.py --size 64 --number 5
+"""
+import os
+import sys
+import time
+import argparse
+import tempfile
+import threading
+import http.client
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROJECT_SETTING', 'settings')
+
+from vank.core.config import conf  # noqa: E402
+from vank.core.app import Application  # noqa: E402
+from vank.core.http.response import ResponseFile  # noqa: E402
+from vank.core.server import make_server, ServerHandler  # noqa: E402
+
+
+def build_application(filepath):
+    application = Application()
+
+    @application.get('/download')
+    def download():
+        return ResponseFile(filepath)
+
+    return application
+
+
+class IterServerHandler(ServerHandler):
+    # 不提供wsgi.file_wrapper ResponseFile将按块迭代
+    wsgi_file_wrapper = None
+
+
+def download(port, number) -> float:
+    elapsed = []
+    for _ in range(number):
+        connection = http.client.HTTPConnection('127.0.0.1', port)
+        start = time.perf_counter()
+        connection.request('GET', '/download')
+        response = connection.getresponse()
+        while response.read(1024 * 1024):
+            pass
+        elapsed.append(time.perf_counter() - start)
+        connection.close()
+    return min(elapsed)
+
+
+def serve(application, handler_class):
+    # 只替换WSGIRequestHandler中使用的ServerHandler
+    from vank.core import server
+    server.ServerHandler = handler_class
+    httpd = make_server('127.0.0.1', 0, application)
+    httpd.RequestHandlerClass.log_message = lambda *args: None
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
+
+
+def main():
+    parser = argparse.ArgumentParser(description='File response benchmark')
+    parser.add_argument('--size', type=int, default=64, help='File size in MiB')
+    parser.add_argument('--number', type=int, default=5, help='Number of downloads per measurement')
+    options = parser.parse_args()
+    with tempfile.NamedTemporaryFile() as f:
+        f.write(os.urandom(1024 * 1024) * options.size)
+        f.flush()
+        application = build_application(f.name)
+        modes = [
+            ('sendfile', ServerHandler, None),
+            ('chunks-2048', IterServerHandler, 2048),
+            (f'chunks-{conf.FILE_CHUNK_SIZE}', IterServerHandler, None),
+        ]
+        print(f'{"mode":<16}{"seconds":>10}{"MiB/s":>10}')
+        for name, handler_class, chunk_size in modes:
+            ResponseFile.chunk_size = chunk_size
+            httpd = serve(application, handler_class)
+            seconds = download(httpd.server_port, options.number)
+            httpd.shutdown()
+            httpd.server_close()
+            print(f'{name:<16}{seconds:>10.4f}{options.size / seconds:>10.1f}')
+
+
+if __name__ == '__main__':
+    main()
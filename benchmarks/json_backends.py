@@ -0,0 +1,80 @@
+# @FileName: json_backends.py
+# @Date    : 2026/10/18-18:30
+# @Author  : vank
+# @Project : vank
+"""
+对比已经安装的JSON编解码器
+载荷包括:
+    - small: 常见的接口响应 {"code": 0, "msg": "ok", "data": {...}}
+    - records: 1000条数据库记录组成的列表
+    - nested: 层级较深的配置数据
+输出每次loads、dumps以及构建ResponseJson(包括编码为响应体)的耗时
+运行: python benchmarks/json_backends.py --backends json,orjson
+"""
+import os
+import sys
+import random
+import timeit
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROJECT_SETTING', 'settings')
+
+from vank.core.config import conf  # noqa: E402
+from vank.core.http.response import ResponseJson  # noqa: E402
+from vank.utils.json_backend import JSON_BACKENDS, load_json_backend, get_json_backend  # noqa: E402
+
+
+def build_payloads(rng):
+    small = {'code': 0, 'msg': 'ok', 'data': {'id': 42, 'name': 'vank', 'tags': ['a', 'b'], 'score': 98.5}}
+    records = [
+        {
+            'id': index,
+            'username': f'user{index}',
+            'email': f'user{index}@example.com',
+            'active': rng.random() > 0.5,
+            'balance': round(rng.uniform(0, 10000), 2),
+            'roles': rng.sample(['admin', 'editor', 'viewer', 'guest'], 2),
+            'profile': {'age': rng.randint(18, 80), 'city': rng.choice(['北京', 'Shanghai', 'Paris'])},
+        }
+        for index in range(1000)
+    ]
+    nested = {'level0': {}}
+    node = nested['level0']
+    for depth in range(1, 50):
+        node[f'level{depth}'] = {'values': list(range(10)), 'name': f'node{depth}'}
+        node = node[f'level{depth}']
+    return {'small': small, 'records': records, 'nested': nested}
+
+
+def bench(func, number):
+    return min(timeit.repeat(func, number=number, repeat=3)) / number * 1e6
+
+
+def main():
+    parser = argparse.ArgumentParser(description='JSON backend benchmark')
+    parser.add_argument('--backends', default=','.join(JSON_BACKENDS), help='Comma separated JSON backends')
+    parser.add_argument('--number', type=int, default=200, help='Number of calls per measurement')
+    options = parser.parse_args()
+    payloads = build_payloads(random.Random(0))
+    print(f'{"backend":<11}{"payload":<9}{"dumps(us)":>11}{"loads(us)":>11}{"response(us)":>14}')
+    for name in options.backends.split(','):
+        try:
+            backend = load_json_backend(name)
+        except ImportError:
+            print(f'{name:<11}not installed')
+            continue
+        conf.JSON_BACKEND = name
+        get_json_backend.cache_clear()
+        for payload_name, payload in payloads.items():
+            encoded = backend.dumps(payload)
+            # 小的载荷调用的次数更多 使结果更稳定
+            number = options.number * 50 if payload_name == 'small' else options.number
+            dumps = bench(lambda: backend.dumps(payload), number)
+            loads = bench(lambda: backend.loads(encoded), number)
+            response = bench(lambda: ResponseJson(payload).body, number)
+            print(f'{name:<11}{payload_name:<9}{dumps:>11.2f}{loads:>11.2f}{response:>14.2f}')
+
+
+if __name__ == '__main__':
+    main()
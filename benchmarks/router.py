@@ -0,0 +1,186 @@
+# @FileName: router.py
+# @Date    : 2026/10/18-16:02
+# @Author  : vank
+# @Project : vank
+"""
+路由的基准测试
+根据常见的路由模板生成不同规模的路由表(静态路由、int、uuid、path参数以及挂载在多级前缀下的子应用)
+并输出以下结果:
+    - 路由注册的耗时
+    - 路由匹配的耗时分位数(请求中包含一定比例的404)
+    - 反向构建url的吞吐量
+运行: python benchmarks/router.py --sizes 10,1000,10000 --engines tree,combined
+"""
+import os
+import sys
+import time
+import random
+import argparse
+from uuid import UUID
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault('PROJECT_SETTING', 'settings')
+
+from vank.core.config import conf  # noqa: E402
+from vank.core import exceptions  # noqa: E402
+from vank.core.http.request import Request  # noqa: E402
+from vank.core.context import _request_context_var  # noqa: E402
+from vank.core.app import Application, SubApplication  # noqa: E402
+
+# 每个资源生成的路由模板
+ROUTE_TEMPLATES = [
+    '/{resource}s',
+    '/{resource}s/health',
+    '/{resource}s/{{id:int}}',
+    '/{resource}s/{{id:int}}/detail',
+    '/{resource}s/{{id:int}}/items/{{item_id:uuid}}',
+    '/{resource}s/by-key/{{key:str}}',
+    '/{resource}s/files/{{fp:path}}',
+]
+# 每个子应用包含的资源数量
+RESOURCES_PER_SUB_APPLICATION = 10
+# 请求中404的比例
+NOT_FOUND_RATIO = 0.1
+
+
+def view(**kwargs):
+    return kwargs
+
+
+def fill_arguments(route, rng):
+    """
+    为路由的参数生成符合转换器的值
+    """
+    arguments = {}
+    for variable, converter in route.argument_converters.items():
+        if converter.name == 'int':
+            arguments[variable] = rng.randint(1, 10 ** 6)
+        elif converter.name == 'uuid':
+            arguments[variable] = UUID(int=rng.getrandbits(128))
+        elif converter.name == 'path':
+            arguments[variable] = f'static/{rng.randint(1, 99)}/main.css'
+        else:
+            arguments[variable] = f'key-{rng.randint(1, 999)}'
+    return arguments
+
+
+def build_application(size, rng):
+    """
+    生成含有size条路由的应用 路由平均分布在根应用和挂载在'/svc{n}/v{m}'下的子应用中
+    """
+    application = Application()
+    resource_number = 0
+    route_number = 0
+    sub_number = 0
+    while route_number < size:
+        if sub_number % 3 == 0:
+            # 根应用的路由
+            target, sub = application, None
+        else:
+            target = sub = SubApplication(f'svc{sub_number}', prefix=f'/svc{sub_number}/v{rng.randint(1, 3)}')
+        for _ in range(RESOURCES_PER_SUB_APPLICATION):
+            for template in ROUTE_TEMPLATES:
+                if route_number >= size:
+                    break
+                target.add_route(template.format(resource=f'res{resource_number}'), view,
+                                 endpoint=f'endpoint{route_number}')
+                route_number += 1
+            resource_number += 1
+        if sub is not None:
+            application.include(sub)
+        sub_number += 1
+    return application
+
+
+def build_requests(application, count, rng):
+    """
+    生成请求路径 包含一定比例的404
+    """
+    routes = list(application.router.routes)
+    paths = []
+    for _ in range(count):
+        if rng.random() < NOT_FOUND_RATIO:
+            paths.append(f'/svc{rng.randint(0, 10 ** 4)}/v9/unknown/{rng.randint(0, 10 ** 6)}')
+            continue
+        route = rng.choice(routes)
+        paths.append(route.url_reflect(route.endpoint, **fill_arguments(route, rng)))
+    return paths
+
+
+def percentile(sorted_values, percent):
+    return sorted_values[min(len(sorted_values) - 1, int(len(sorted_values) * percent / 100))]
+
+
+def bench_match(application, paths):
+    """
+    逐个请求计时 返回每次匹配的耗时(纳秒)
+    """
+    router = application.router
+    timings = []
+    perf_counter_ns = time.perf_counter_ns
+    for path in paths:
+        request = Request({'PATH_INFO': path, 'REQUEST_METHOD': 'GET'})
+        # 预先解析path 只统计路由匹配的耗时
+        request.path  # noqa
+        token = _request_context_var.set(request)
+        start = perf_counter_ns()
+        try:
+            router.match()
+        except (exceptions.NotFoundException, exceptions.MethodNotAllowedException):
+            pass
+        timings.append(perf_counter_ns() - start)
+        _request_context_var.reset(token)
+    return sorted(timings)
+
+
+def bench_reflect(application, count, rng):
+    """
+    返回每秒反向构建url的次数
+    """
+    routes = list(application.router.routes)
+    calls = []
+    for _ in range(count):
+        route = rng.choice(routes)
+        calls.append((route.endpoint, fill_arguments(route, rng)))
+    start = time.perf_counter()
+    for endpoint, arguments in calls:
+        application.url_reflect(endpoint, **arguments)
+    return count / (time.perf_counter() - start)
+
+
+def run(size, engine, requests, seed):
+    rng = random.Random(seed)
+    conf.ROUTER_ENGINE = engine
+    start = time.perf_counter()
+    application = build_application(size, rng)
+    registration = time.perf_counter() - start
+    paths = build_requests(application, requests, rng)
+    # 预热 combined引擎会在每个分区第一次匹配时构建正则 所以每条路由都需要匹配一次
+    warmup_rng = random.Random(seed)
+    bench_match(application, [
+        route.url_reflect(route.endpoint, **fill_arguments(route, warmup_rng))
+        for route in application.router.routes
+    ])
+    timings = bench_match(application, paths)
+    reflect = bench_reflect(application, requests, rng)
+    print(f'{size:>7}{engine:>10}{registration * 1000:>14.1f}'
+          f'{percentile(timings, 50) / 1000:>9.2f}{percentile(timings, 90) / 1000:>9.2f}'
+          f'{percentile(timings, 99) / 1000:>9.2f}{reflect:>14.0f}')
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Router benchmark')
+    parser.add_argument('--sizes', default='10,1000,10000', help='Comma separated route table sizes')
+    parser.add_argument('--engines', default='tree,combined', help='Comma separated router engines')
+    parser.add_argument('--requests', type=int, default=20000, help='Number of requests per run')
+    parser.add_argument('--seed', type=int, default=0)
+    options = parser.parse_args()
+    print(f'{"routes":>7}{"engine":>10}{"register(ms)":>14}{"p50(us)":>9}{"p90(us)":>9}{"p99(us)":>9}'
+          f'{"reflect/s":>14}')
+    for size in map(int, options.sizes.split(',')):
+        for engine in options.engines.split(','):
+            run(size, engine, options.requests, options.seed)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,17 @@
+# 基准测试使用的配置
+SECRET_KEY = 'benchmark-secret-key-0123456789'
+
+ROUTE_CONVERTERS = {
+    'int': 'vank.core.routing.converters:IntConverter',
+    'float': 'vank.core.routing.converters:FloatConverter',
+    'email': 'vank.core.routing.converters:EmailConverter',
+    'uuid': 'vank.core.routing.converters:UUIDConverter',
+    'path': 'vank.core.routing.converters:PathConverter',
+    'str': 'vank.core.routing.converters:StrConverter',
+}
+
+ERROR_HANDLER = 'vank.core.handlers.exception:default_handler'
+
+STATIC_URL = '/static'
+
+DEFAULT_CHARSET = 'utf-8'
@@ -1,4 +1,3 @@
-from vank.core import request
 from vank.core.view import View
 from vank.applications.static import control as ct
 
@@ -9,6 +8,5 @@ class StaticView(View):
     """
 
     def get(self, fp, *args, **kwargs):  # noqa
-        if_modify_since = request.headers.get('IF_MODIFIED_SINCE', None)
-        response = ct.get_file(if_modify_since, fp)
+        response = ct.get_file(fp)
         return response
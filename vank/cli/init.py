@@ -30,6 +30,65 @@ ROUTE_CONVERTERS = {
     'str': 'vank.core.routing.converters:StrConverter',
 }
 
+# 路由匹配引擎 tree:路由树 combined:合并为一条正则
+ROUTER_ENGINE = 'tree'
+
+# 路由匹配结果的缓存数量 0为不使用缓存
+ROUTER_CACHE_SIZE = 0
+
+# 预编译的路由表缓存文件 通过 python -m vank routes --compile 生成 为空时不使用
+ROUTE_CACHE_FILE = ''
+
+# 请求体的最大字节数 超过时返回413 0为不限制
+MAX_CONTENT_LENGTH = 0
+
+# 按块读取请求体时每块的字节数
+REQUEST_CHUNK_SIZE = 64 * 1024
+
+# 读取请求体时解压Content-Encoding为gzip或deflate的请求体
+DECOMPRESS_REQUEST_BODY = False
+
+# 请求体解压后的最大字节数 超过时返回413 0为不限制
+MAX_DECOMPRESSED_LENGTH = 10 * 1024 * 1024
+
+# multipart/form-data中每个部分的最大字节数 0为不限制
+MULTIPART_MAX_PART_SIZE = 0
+
+# multipart/form-data中所有部分的最大字节数 0为不限制
+MULTIPART_MAX_SIZE = 0
+
+# 上传的文件超过该字节数时写到磁盘上的临时文件
+UPLOAD_SPOOL_SIZE = 1024 * 1024
+
+# 上传文件的临时目录 为空时使用系统的临时目录 与保存的目录位于同一文件系统时保存文件只需要重命名
+UPLOAD_TEMP_DIR = ''
+
+# request.json与ResponseJson使用的JSON编解码器 json:标准库json auto:使用已经安装的orjson、ujson或rapidjson 都没有安装时使用标准库json
+# 第三方库的输出可能与标准库不同 例如orjson将NaN编码为null
+# 也可以是提供loads和dumps的模块的导入路径 或者(loads, dumps)
+JSON_BACKEND = 'json'
+
+# 请求头Cookie解析结果的缓存数量 0为不使用缓存
+COOKIE_CACHE_SIZE = 128
+
+# 服务器不提供wsgi.file_wrapper时 ResponseFile按块读取文件每块的字节数
+FILE_CHUNK_SIZE = 256 * 1024
+
+# ResponseFile的ETag stat:由修改时间、大小和inode生成 也可以是hashlib的算法名称(例如sha256)使用文件内容的哈希 为空时不生成
+FILE_ETAG = 'stat'
+
+# FILE_ETAG为哈希算法时缓存的文件哈希数量 0为不使用缓存
+FILE_ETAG_CACHE_SIZE = 1024
+
+# CompressionMiddleware使用的gzip压缩级别 1-9
+COMPRESSION_LEVEL = 6
+
+# CompressionMiddleware使用的brotli压缩质量 0-11 需要安装brotli
+COMPRESSION_BROTLI_QUALITY = 4
+
+# CompressionMiddleware不压缩小于该字节数的响应
+COMPRESSION_MIN_SIZE = 500
+
 # 中间件
 MIDDLEWARES = [
     'vank.middleware.session:SessionMiddleware'
@@ -0,0 +1,50 @@
+# @FileName: routes.py
+# @Date    : 2026/10/18-14:05
+# @Author  : vank
+# @Project : vank
+import os
+import sys
+from vank.utils.cli import BaseCommand
+
+
+class Command(BaseCommand):
+    description = 'Show the route table or compile it into the route cache file'
+
+    def run(self, argv):
+        options, args = self.parser.parse_known_args(argv[2:])
+        # 在导入配置之前将当前目录添加到sys.path中 以便导入项目中的模块
+        sys.path.insert(0, os.getcwd())
+        from vank.core.config import conf
+        from vank.core.routing.cache import RouteCache
+        from vank.utils.load_module import import_from_str
+
+        application = import_from_str(options.app)
+        if not options.compile:
+            self.stdout.write(f'{application.router}\n')
+            return
+        filepath = options.output or conf.ROUTE_CACHE_FILE
+        if not filepath:
+            self.stderr.write('Please provide the path of the route cache file through "-o" or ROUTE_CACHE_FILE\n')
+            sys.exit(1)
+        cache = RouteCache.from_router(application.router)
+        cache.dump(str(filepath))
+        self.stdout.write(f'{len(cache.rules)} routes have been compiled into "{filepath}"\n')
+
+    def init_arguments(self):
+        self.parser.add_argument(
+            '-a',
+            '--app',
+            help='Import path of the application, e.g. main:app',
+            default='main:app'
+        )
+        self.parser.add_argument(
+            '-c',
+            '--compile',
+            help='Compile the route table into the route cache file',
+            action='store_true'
+        )
+        self.parser.add_argument(
+            '-o',
+            '--output',
+            help='Path of the route cache file, defaults to ROUTE_CACHE_FILE'
+        )
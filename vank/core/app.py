@@ -6,14 +6,15 @@ from vank.core.view import View
 from vank.core.config import conf
 from vank.utils import import_from_str
 from vank.__version__ import __version__
+from vank.core.server import make_server
 from vank.core.routing.route import Route
 from vank.core.http.request import Request
 from vank.core.routing.router import Router
-from wsgiref.simple_server import make_server
 from vank.utils.reloader import run_in_reloader
 from vank.middleware.base import BaseMiddleware
 from vank.core.http.response import BaseResponse
 from vank.core.context import request, application
+from vank.core.binding import bind_view_arguments
 from vank.core.exceptions import NoResponseException
 from vank.utils.log import setup_config as setup_log_config
 from vank.core.handlers.exception import conv_exc_to_response
@@ -38,6 +39,8 @@ class Base:
             raise ValueError(f'Please provide an endpoint for %s' % view_func)
         # 实例化一个路由
         route = Route(route_path, methods, endpoint, **kwargs)
+        # 在注册时编译视图参数的绑定器 处理请求时不再检查视图的签名
+        view_func = bind_view_arguments(view_func, route.argument_converters)
         # 添加到路由映射表中
         self.router.add_route(route_path, route, view_func)
 
@@ -219,7 +222,7 @@ class Application(Base):
                 sub.name
             ))
 
-        self.router.include_router(sub.router)  # 将子应用的路由包含到主路由中
+        self.router.include_router(sub.router, sub.prefix)  # 将子应用的路由包含到主路由中
         sub.root = self  # 对子应用进行绑定
         self.sub_applications[sub.name] = sub
 
@@ -231,11 +234,13 @@ class Application(Base):
         view_function, view_kwargs = self.router.match()
         return view_function, view_kwargs
 
-    def _finish_response(self, response: BaseResponse, start_response: callable) -> t.Iterable[bytes]:
+    def _finish_response(self, response: BaseResponse, start_response: callable,
+                         environ: dict) -> t.Iterable[bytes]:
         """
         处理response 调用start_response设置响应状态码和响应头
         :param response: 封装的response 详情请看Vank/core/http/response
         :param start_response: WSGI规范的start_response
+        :param environ: WSGI环境变量 响应可以使用服务器提供的wsgi.file_wrapper
         :return: Iterable[bytes] 返回的body数据
         """
         # 默认的output的header参数是”Set-Cookie:“
@@ -245,7 +250,7 @@ class Application(Base):
         # 设置cookie
         headers.extend([("Set-Cookie", cookie.output(header="")) for cookie in response.cookies.values()])
         start_response(response.status, headers)
-        return response
+        return response.get_app_iter(environ)
 
     def __call__(self, environ: dict, start_response: callable) -> t.Iterable[bytes]:
         """
@@ -254,18 +259,19 @@ class Application(Base):
         :param start_response:WSGI规范的一个function 我们需要给他设置响应码以及响应头等信息
         :return:作为响应数据
         """
+        current_request = Request(environ)
         app_token = application._wrapped.set(self)  # noqa
-        request_token = request._wrapped.set(Request(environ))  # noqa
+        request_token = request._wrapped.set(current_request)  # noqa
         # 请求开始信号
         on_request_start.emit(self)
         response = self.entry_func()
         # 请求结束信号
         on_request_end.emit(self, response=response)
-        # 关闭request的资源
-        request.close()
+        # 关闭request的资源 流响应在迭代结束后才会关闭
+        response.call_on_close(current_request.close)
         request._wrapped.reset(request_token)  # noqa
         application._wrapped.reset(app_token)  # noqa
-        return self._finish_response(response, start_response)
+        return self._finish_response(response, start_response, environ)
 
     def url_reflect(self, endpoint: str, **kwargs):
         return self.router.url_reflect(endpoint, **kwargs)
@@ -0,0 +1,324 @@
+# @FileName: binding.py
+# @Date    : 2026/10/18-20:30
+# @Author  : vank
+# @Project : vank
+import math
+import inspect
+import typing as t
+import dataclasses
+from functools import wraps
+from vank.core.context import _request_context_var
+from vank.core.exceptions import ArgumentBindingException
+from vank.core.routing.cache import get_route_cache
+from vank.utils.datastructures import MultiValueDict, SpooledUploadFile, missing
+
+"""
+视图参数绑定
+注册路由时检查视图的签名 为除路由参数以外、带有类型注解的参数编译绑定器
+处理请求时绑定器从查询参数、JSON或表单中取出这些参数并转换类型 不需要再使用inspect
+支持的类型注解: int float bool str SpooledUploadFile list[X] Optional[X] 以及由这些类型组成的dataclass
+取值的顺序: 查询参数 --> 请求体(JSON对象或表单) dataclass则使用请求体中与参数同名的对象
+或者请求体中属于它的字段(只有这一个参数时使用整个请求体)
+参数缺失、类型不正确或者dataclass中出现未知的字段时返回400
+"""
+
+TRUE_VALUES = frozenset(['true', '1', 'yes', 'on'])
+FALSE_VALUES = frozenset(['false', '0', 'no', 'off'])
+# 从请求体中取值的Content-Type
+JSON_CONTENT_TYPE = 'application/json'
+FORM_CONTENT_TYPES = frozenset(['application/x-www-form-urlencoded', 'multipart/form-data'])
+
+
+def convert_int(value):
+    if isinstance(value, bool):
+        raise ValueError('expected an integer')
+    if isinstance(value, int):
+        return value
+    if isinstance(value, str) and value.strip().lstrip('+-').isdecimal():
+        return int(value)
+    raise ValueError('expected an integer')
+
+
+def convert_float(value):
+    if isinstance(value, bool):
+        raise ValueError('expected a number')
+    if isinstance(value, (int, float)):
+        return float(value)
+    if isinstance(value, str):
+        number = float(value)
+        if math.isfinite(number):
+            return number
+    raise ValueError('expected a number')
+
+
+def convert_bool(value):
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, str):
+        if value.lower() in TRUE_VALUES:
+            return True
+        if value.lower() in FALSE_VALUES:
+            return False
+    elif isinstance(value, int) and value in (0, 1):
+        return bool(value)
+    raise ValueError('expected a boolean')
+
+
+def convert_str(value):
+    if isinstance(value, str):
+        return value
+    raise ValueError('expected a string')
+
+
+def convert_upload_file(value):
+    if isinstance(value, SpooledUploadFile):
+        return value
+    raise ValueError('expected a file')
+
+
+# 类型注解 --> 转换函数
+CONVERTERS = {
+    int: convert_int,
+    float: convert_float,
+    bool: convert_bool,
+    str: convert_str,
+    SpooledUploadFile: convert_upload_file,
+}
+
+
+class ValueBinder:
+    """
+    编译后的类型注解
+    """
+
+    def __init__(self, convert: t.Callable, is_list: bool = False, optional: bool = False,
+                 is_dataclass: bool = False):
+        self.convert = convert
+        self.is_list = is_list
+        self.optional = optional
+        self.is_dataclass = is_dataclass
+
+    def __call__(self, value):
+        if value is None and self.optional:
+            return None
+        if self.is_list:
+            if not isinstance(value, (list, tuple)):
+                raise ValueError('expected a list')
+            return [self.convert(item) for item in value]
+        return self.convert(value)
+
+
+def get_type_hints(obj) -> dict:
+    try:
+        return t.get_type_hints(obj)
+    except Exception:  # noqa
+        # 无法解析的前向引用
+        return getattr(obj, '__annotations__', {})
+
+
+def compile_annotation(annotation) -> t.Optional[ValueBinder]:
+    """
+    将类型注解编译为ValueBinder 不支持的类型注解返回None
+    """
+    origin = getattr(annotation, '__origin__', None)
+    arguments = getattr(annotation, '__args__', None) or ()
+    if origin is t.Union:
+        types = [argument for argument in arguments if argument is not type(None)]
+        if len(types) != 1 or len(types) == len(arguments):
+            return None
+        binder = compile_annotation(types[0])
+        if binder is not None:
+            binder.optional = True
+        return binder
+    if annotation is list or origin is list:
+        item = compile_annotation(arguments[0] if arguments else str)
+        if item is None or item.is_list:
+            return None
+        return ValueBinder(item, is_list=True)
+    if annotation in CONVERTERS:
+        return ValueBinder(CONVERTERS[annotation])
+    if inspect.isclass(annotation) and dataclasses.is_dataclass(annotation):
+        return ValueBinder(compile_dataclass(annotation), is_dataclass=True)
+    return None
+
+
+def compile_dataclass(cls) -> t.Callable:
+    """
+    编译从dict构建dataclass的函数 不支持的字段类型会原样传入
+    """
+    hints = get_type_hints(cls)
+    fields = []
+    for field in dataclasses.fields(cls):
+        if not field.init:
+            continue
+        required = field.default is dataclasses.MISSING and field.default_factory is dataclasses.MISSING  # noqa
+        fields.append((field.name, compile_annotation(hints.get(field.name)), required))
+    names = frozenset(name for name, binder, required in fields)
+
+    def convert(value):
+        if not isinstance(value, dict):
+            raise ValueError(f'expected an object for {cls.__name__}')
+        unknown = value.keys() - names
+        if unknown:
+            raise ValueError(f'unknown fields {", ".join(sorted(unknown))}')
+        arguments = {}
+        for name, binder, required in fields:
+            if name not in value:
+                if required:
+                    raise ValueError(f'missing field "{name}"')
+                continue
+            try:
+                arguments[name] = value[name] if binder is None else binder(value[name])
+            except (TypeError, ValueError) as e:
+                raise ValueError(f'field "{name}" {e}') from e
+        return cls(**arguments)
+
+    # 从查询参数构建时只取这些字段
+    convert.fields = names
+    return convert
+
+
+class ArgumentBinder:
+    """
+    从请求中取出视图参数的绑定器
+    """
+
+    def __init__(self, parameters: t.List[t.Tuple[str, ValueBinder, t.Any]]):
+        """
+        :param parameters: [(参数名, ValueBinder, 默认值)] 没有默认值时为missing
+        """
+        self.parameters = parameters
+        # 只有一个参数时dataclass可以使用整个请求体 否则请求体中还有属于其他参数的key
+        self.whole_body = len(parameters) == 1
+
+    @staticmethod
+    def get_body(request):
+        """
+        获取请求体中的JSON对象或者表单 没有请求体或者其他类型的请求体返回None
+        """
+        if not request.content_length:
+            return None
+        content_type = request.content_type.lower()
+        if content_type == JSON_CONTENT_TYPE:
+            try:
+                body = request.json
+            except ValueError as e:
+                raise ArgumentBindingException(f'Invalid JSON body: {e}') from e
+            return body if isinstance(body, dict) else None
+        if content_type in FORM_CONTENT_TYPES:
+            return request.form
+        return None
+
+    @staticmethod
+    def get_fields_value(binder, source):
+        """
+        只取dataclass的字段构建dict 一个字段都没有时返回missing
+        表单与查询参数取每个key的最后一个值
+        """
+        fields = binder.convert.fields
+        value = {key: source[key] for key in source if key in fields}
+        return value or missing
+
+    def get_query_value(self, name, binder, query):
+        if binder.is_dataclass:
+            # 其他查询参数可能属于别的视图参数
+            return self.get_fields_value(binder, query)
+        if name not in query:
+            return missing
+        return query.get_all(name) if binder.is_list else query[name]
+
+    def get_body_value(self, name, binder, body):
+        if body is None:
+            return missing
+        if binder.is_dataclass:
+            if isinstance(body.get(name), dict):
+                return body[name]
+            if not self.whole_body:
+                return self.get_fields_value(binder, body)
+            # 表单取每个key的最后一个值
+            return dict(body.items()) if isinstance(body, MultiValueDict) else body
+        if name not in body:
+            return missing
+        if binder.is_list and isinstance(body, MultiValueDict):
+            return body.get_all(name)
+        return body[name]
+
+    def __call__(self, request) -> dict:
+        """
+        普通参数优先使用查询参数 dataclass优先使用请求体
+        只有在需要时才读取请求体 参数都在查询参数中时视图仍然可以使用request.iter_json等方式读取请求体
+        """
+        query = request.query
+        body = missing
+        arguments = {}
+        for name, binder, default in self.parameters:
+            value = missing if binder.is_dataclass else self.get_query_value(name, binder, query)
+            if value is missing:
+                if body is missing:
+                    body = self.get_body(request)
+                value = self.get_body_value(name, binder, body)
+            if value is missing and binder.is_dataclass and body is None:
+                value = self.get_query_value(name, binder, query)
+            if value is missing:
+                if default is not missing:
+                    continue
+                if binder.optional:
+                    arguments[name] = None
+                    continue
+                raise ArgumentBindingException(f'Missing parameter "{name}"')
+            try:
+                arguments[name] = binder(value)
+            except (TypeError, ValueError) as e:
+                raise ArgumentBindingException(f'Invalid parameter "{name}": {e}') from e
+        return arguments
+
+
+def compile_binder(view_func, path_arguments: t.Iterable[str]) -> t.Optional[ArgumentBinder]:
+    """
+    检查视图的签名 为除路由参数以外、带有支持的类型注解的参数编译绑定器
+    没有需要绑定的参数时返回None
+    """
+    path_arguments = set(path_arguments)
+    hints = get_type_hints(view_func)
+    parameters = []
+    for name, parameter in inspect.signature(view_func).parameters.items():
+        if name in path_arguments or parameter.kind in (parameter.VAR_POSITIONAL, parameter.VAR_KEYWORD):
+            continue
+        if name not in hints:
+            continue
+        binder = compile_annotation(hints[name])
+        if binder is None:
+            continue
+        default = missing if parameter.default is parameter.empty else parameter.default
+        parameters.append((name, binder, default))
+    return ArgumentBinder(parameters) if parameters else None
+
+
+def bind_view_arguments(view_func: t.Callable, path_arguments: t.Iterable[str]) -> t.Callable:
+    """
+    为视图编译绑定器 返回在调用视图之前绑定参数的视图
+    类视图会替换每个请求方法对应的类方法 并返回原来的类视图
+    """
+    # 避免循环导入
+    from vank.core.view import View
+    # 预编译的路由表缓存中记录了不需要绑定器的视图 不需要再检查签名
+    route_cache = get_route_cache()
+    if route_cache and route_cache.is_unbound_view(view_func, path_arguments):
+        return view_func
+    if isinstance(view_func, View):
+        path_arguments = list(path_arguments)
+        for method, handler in view_func.method_handlers.items():
+            view_func.method_handlers[method] = bind_view_arguments(handler, path_arguments)
+        return view_func
+    binder = compile_binder(view_func, path_arguments)
+    if binder is None:
+        return view_func
+
+    @wraps(view_func)
+    def view(*args, **kwargs):
+        for name, value in binder(_request_context_var.get()).items():
+            kwargs.setdefault(name, value)
+        return view_func(*args, **kwargs)
+
+    view.binder = binder
+    return view
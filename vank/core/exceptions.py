@@ -30,3 +30,15 @@ class NoResponseException(Exception):
 
 class NoneViewMethodException(Exception):
     """类视图未定义至少一个类方法"""
+
+
+class RequestEntityTooLargeException(Exception):
+    """请求体超过了MAX_CONTENT_LENGTH"""
+
+
+class RequestBodyConsumedException(Exception):
+    """请求体已经被读取"""
+
+
+class ArgumentBindingException(Exception):
+    """视图参数缺失或者类型不正确"""
@@ -1,5 +1,6 @@
 from vank.core.http import response
 from vank.core.exceptions import *
+from vank.utils.parsers import ParseException, ParseSizeException
 from logging import getLogger
 
 logger = getLogger('server')
@@ -34,6 +35,12 @@ def default_handler(exc):
         resp = response.Response405(exc.allow)
     elif isinstance(exc, PermissionDeniedException):
         resp = response.Response403()
+    elif isinstance(exc, (RequestEntityTooLargeException, ParseSizeException)):
+        resp = response.Response413()
+    elif isinstance(exc, ArgumentBindingException):
+        resp = response.Response400(str(exc))
+    elif isinstance(exc, ParseException):
+        resp = response.Response400()
     else:
         resp = response.Response500()
     logger.error("Error - ", exc_info=exc)
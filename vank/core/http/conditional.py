@@ -0,0 +1,157 @@
+# @FileName: conditional.py
+# @Date    : 2026/10/18-22:10
+# @Author  : vank
+# @Project : vank
+import os
+import hashlib
+import typing as t
+from functools import wraps, lru_cache
+from vank.core.config import conf
+from email.utils import formatdate, parsedate_to_datetime
+from vank.utils.datastructures import LRUCache
+from vank.core.context import request
+
+"""
+条件请求
+根据ETag与Last-Modified验证器处理If-Match、If-Unmodified-Since、If-None-Match与If-Modified-Since
+验证器在读取文件或者执行视图之前就可以得到 客户端的缓存仍然有效时直接返回304 不需要传输响应体
+https://developer.mozilla.org/zh-CN/docs/Web/HTTP/Conditional_requests
+"""
+
+
+def parse_etags(value: str) -> t.List[str]:
+    """
+    解析If-Match与If-None-Match中以逗号分隔的ETag 保留W/前缀
+    """
+    return [etag.strip() for etag in value.split(',') if etag.strip()]
+
+
+def strong_match(etag: str, etags: t.List[str]) -> bool:
+    """
+    强比较 两者都不能是弱ETag
+    """
+    if '*' in etags:
+        return True
+    return not etag.startswith('W/') and etag in etags
+
+
+def weak_match(etag: str, etags: t.List[str]) -> bool:
+    """
+    弱比较 忽略W/前缀
+    """
+    if '*' in etags:
+        return True
+    etag = etag[2:] if etag.startswith('W/') else etag
+    return any((other[2:] if other.startswith('W/') else other) == etag for other in etags)
+
+
+def parse_http_date(value: str) -> t.Optional[int]:
+    try:
+        return int(parsedate_to_datetime(value).timestamp())
+    except (TypeError, ValueError, IndexError, OverflowError):
+        return None
+
+
+def check_conditions(method: str,
+                     headers,
+                     etag: t.Optional[str] = None,
+                     last_modified: t.Optional[float] = None) -> t.Optional[int]:
+    """
+    按照RFC 9110 13.2.2的顺序检查条件请求头
+    :param method: 请求方法
+    :param headers: 请求头
+    :param etag: 资源当前的ETag
+    :param last_modified: 资源最后修改时间的时间戳
+    :return: 304或412 条件满足需要正常响应时返回None
+    """
+    if etag is None and last_modified is None:
+        return None
+    last_modified = None if last_modified is None else int(last_modified)
+    if_match = headers.get('IF_MATCH')
+    if if_match:
+        if etag is None or not strong_match(etag, parse_etags(if_match)):
+            return 412
+    elif last_modified is not None:
+        if_unmodified_since = parse_http_date(headers.get('IF_UNMODIFIED_SINCE') or '')
+        if if_unmodified_since is not None and last_modified > if_unmodified_since:
+            return 412
+    if_none_match = headers.get('IF_NONE_MATCH')
+    if if_none_match:
+        if etag is not None and weak_match(etag, parse_etags(if_none_match)):
+            return 304 if method in ('GET', 'HEAD') else 412
+    elif last_modified is not None and method in ('GET', 'HEAD'):
+        # HTTP日期只精确到秒
+        if_modified_since = parse_http_date(headers.get('IF_MODIFIED_SINCE') or '')
+        if if_modified_since is not None and last_modified <= if_modified_since:
+            return 304
+    return None
+
+
+@lru_cache(maxsize=None)
+def get_etag_cache() -> t.Optional[LRUCache]:
+    """
+    (文件路径, 修改时间, 大小, inode) --> 文件内容的哈希 的缓存
+    """
+    return LRUCache(conf.FILE_ETAG_CACHE_SIZE) if conf.FILE_ETAG_CACHE_SIZE else None
+
+
+def file_etag(filepath: str, stat: os.stat_result) -> t.Optional[str]:
+    """
+    根据FILE_ETAG生成文件的ETag
+    stat: 由修改时间、大小和inode生成 不需要读取文件
+    hashlib的算法名称: 文件内容的哈希 结果按照文件的修改时间、大小和inode缓存 文件改变后重新计算
+    """
+    if not conf.FILE_ETAG:
+        return None
+    if conf.FILE_ETAG == 'stat':
+        return f'"{stat.st_mtime_ns:x}-{stat.st_size:x}-{stat.st_ino:x}"'
+    key = (filepath, stat.st_mtime_ns, stat.st_size, stat.st_ino)
+    cache = get_etag_cache()
+    etag = cache.get(key) if cache is not None else None
+    if etag is None:
+        digest = hashlib.new(conf.FILE_ETAG)
+        with open(filepath, 'rb') as f:
+            for chunk in iter(lambda: f.read(conf.FILE_CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = f'"{digest.hexdigest()}"'
+        if cache is not None:
+            cache.set(key, etag)
+    return etag
+
+
+def conditional(etag: t.Optional[t.Callable[..., t.Optional[str]]] = None,
+                last_modified: t.Optional[t.Callable[..., t.Optional[float]]] = None):
+    """
+    视图的条件请求装饰器 在执行视图之前计算验证器 缓存有效时直接返回304 前置条件失败时返回412
+    例如:
+     @app.get('/articles/{aid:int}')
+     @conditional(etag=lambda aid: f'"{get_version(aid)}"', last_modified=lambda aid: get_updated_at(aid))
+     def article(aid):
+         ...
+    :param etag: 接收视图的参数 返回带引号的ETag
+    :param last_modified: 接收视图的参数 返回最后修改时间的时间戳
+    """
+
+    def decorator(view_func):
+        @wraps(view_func)
+        def inner(*args, **kwargs):
+            # 避免循环导入
+            from vank.core.http.response import Response304, Response412
+            current_etag = etag(*args, **kwargs) if etag else None
+            current_last_modified = last_modified(*args, **kwargs) if last_modified else None
+            status = check_conditions(request.method, request.headers, current_etag, current_last_modified)
+            if status == 304:
+                response = Response304()
+            elif status == 412:
+                response = Response412()
+            else:
+                response = view_func(*args, **kwargs)
+            if current_etag is not None:
+                response.headers.setdefault('ETag', current_etag)
+            if current_last_modified is not None:
+                response.headers.setdefault('Last-Modified', formatdate(current_last_modified, usegmt=True))
+            return response
+
+        return inner
+
+    return decorator
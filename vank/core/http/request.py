@@ -1,29 +1,44 @@
-import json
 import typing as t
 from cgi import parse_header
-from http.cookies import SimpleCookie
 from urllib.parse import unquote_plus, parse_qsl
-from vank.utils.parsers import FormParser, MultiPartFormParser
-from vank.utils.datastructures import Form, Headers, QueryString
+from vank.core.config import conf
+from functools import lru_cache
+from vank.utils.stream import LimitedStream, DecompressedStream
+from vank.utils.cookies import parse_cookie
+from vank.utils.json_backend import get_json_backend
+from vank.core.exceptions import RequestBodyConsumedException, RequestEntityTooLargeException
+from vank.utils.parsers import FormParser, MultiPartFormParser, NDJsonParser, JsonArrayParser
+from vank.utils.datastructures import Form, Headers, QueryString, LRUCache, missing
 
 
 class BaseRequest:
+    # 每个请求都会创建一个实例 使用__slots__减少内存分配
+    # session由SessionMiddleware设置 __dict__用于中间件或视图在请求上添加自定义的属性
+    __slots__ = (
+        'environ', '_json', '_form', '_content_type', '_content_params', '_path', '_stream', '_body', '_method',
+        '_headers', '_cookies', '_query', '_charset', '_content_length', 'session', '__dict__',
+    )
+
     def __init__(self, environ: dict):
         self.environ: dict = environ
-        self._json: t.Union[None, t.Dict[str, t.Any]] = None
+        # 惰性属性 值为None时需要与未计算区分的属性使用missing作为哨兵
+        self._json: t.Any = missing
         self._form: t.Union[None, Form] = None
         self._content_type: t.Union[None, str] = None
         self._content_params: t.Union[None, dict] = None
         self._path: t.Union[None, str] = None
         self._stream: t.Union[None, bytes] = None
+        self._body: t.Union[None, LimitedStream, DecompressedStream] = None
         self._method: t.Union[None, str] = None
         self._headers: t.Union[None, Headers] = None
-        self._cookies: t.Union[None, SimpleCookie] = None
+        self._cookies: t.Union[None, dict] = None
         self._query: t.Union[None, QueryString] = None
+        self._charset: t.Any = missing
+        self._content_length: t.Any = missing
 
     @property
     def headers(self) -> Headers:
-        if getattr(self, '_headers') is None:
+        if self._headers is None:
             self._headers = Headers(parse_headers(environ=self.environ))
         return self._headers
 
@@ -61,14 +76,39 @@ class BaseRequest:
             self._set_up_content_type()
         return self._content_type
 
+    @property
+    def body(self) -> t.Union[LimitedStream, DecompressedStream]:
+        """
+        请求体的流 可以像文件一样read 也可以迭代按REQUEST_CHUNK_SIZE逐块读取
+        请求体只能被读取一次 读取过body之后不能再使用stream 反之亦然
+        开启DECOMPRESS_REQUEST_BODY时 Content-Encoding为gzip或deflate的请求体会在读取时解压
+        :return:
+        """
+        if self._stream is not None:
+            raise RequestBodyConsumedException('The request body has already been read by "stream"')
+        if self._body is None:
+            # 在读取请求体之前检查长度
+            if conf.MAX_CONTENT_LENGTH and self.content_length > conf.MAX_CONTENT_LENGTH:
+                raise RequestEntityTooLargeException(
+                    f'The request body exceeds the limit of {conf.MAX_CONTENT_LENGTH} bytes')
+            body = LimitedStream(self.environ.get('wsgi.input'), self.content_length, conf.REQUEST_CHUNK_SIZE)
+            content_encoding = self.headers.get('CONTENT_ENCODING', '').strip().lower()
+            if conf.DECOMPRESS_REQUEST_BODY and content_encoding in DecompressedStream.encodings:
+                body = DecompressedStream(body, content_encoding, conf.MAX_DECOMPRESSED_LENGTH, conf.REQUEST_CHUNK_SIZE)
+            self._body = body
+        return self._body
+
     @property
     def stream(self) -> bytes:
         """
-        读取字节流
+        将整个请求体读取为字节流 适用于较小的请求体 较大的请求体请使用body
         :return:
         """
         if self._stream is None:
-            self._stream = self.environ.get('wsgi.input').read(self.content_length)
+            body = self.body
+            if body.consumed:
+                raise RequestBodyConsumedException('The request body has already been read by "body"')
+            self._stream = body.read()
         return self._stream
 
     @property
@@ -77,11 +117,27 @@ class BaseRequest:
         解析body
         :return:
         """
-        if self._json is None:
+        if self._json is missing:
             if self.content_type.lower() == 'application/json':
-                self._json = json.loads(self.stream) or None
+                self._json = get_json_backend().loads(self.stream) or None
+            else:
+                self._json = None
         return self._json
 
+    def iter_json(self, array: t.Optional[bool] = None) -> t.Iterator[t.Any]:
+        """
+        逐块读取请求体 逐条产出解码后的JSON记录 视图可以在请求体上传完成之前开始处理记录
+        请求体只能被读取一次 所以不能与json、stream同时使用
+        :param array: True:请求体为顶层JSON数组 False:请求体为NDJSON(每行一个JSON)
+                      None:Content-Type为application/json时视为JSON数组 否则视为NDJSON
+        :return:
+        """
+        if array is None:
+            array = self.content_type.lower() == 'application/json'
+        if array:
+            return iter(JsonArrayParser(self.body, self.charset))
+        return iter(NDJsonParser(self.body, get_json_backend().loads))
+
     @property
     def form(self) -> Form:
         """
@@ -90,7 +146,12 @@ class BaseRequest:
         """
         if self._form is None:
             if self.content_type == 'multipart/form-data':
-                parser = MultiPartFormParser(self.content_params, self.stream, self.charset)
+                # multipart的请求体可能很大 逐块读取并解析
+                parser = MultiPartFormParser(
+                    self.content_params, self.body, self.charset,
+                    max_part_size=conf.MULTIPART_MAX_PART_SIZE, max_size=conf.MULTIPART_MAX_SIZE,
+                    spool_size=conf.UPLOAD_SPOOL_SIZE, temp_dir=conf.UPLOAD_TEMP_DIR or None
+                )
                 form = parser.run()
             elif self.content_type == 'application/x-www-form-urlencoded':
                 parser = FormParser(self.stream)
@@ -106,8 +167,8 @@ class BaseRequest:
         获取charset
         :return:
         """
-        if not hasattr(self, '_charset'):
-            setattr(self, '_charset', self.content_params.get('charset', 'utf-8'))
+        if self._charset is missing:
+            self._charset = self.content_params.get('charset', 'utf-8')
         return self._charset
 
     @property
@@ -116,14 +177,14 @@ class BaseRequest:
         获取到content-length
         :return:
         """
-        if not hasattr(self, '_content_length'):
+        if self._content_length is missing:
             content_length = self.headers.get('CONTENT_LENGTH', 0)
             try:
                 content_length = int(content_length)
             except Exception as e:  # noqa
                 content_length = 0
-            setattr(self, '_content_length', content_length)
-        return self._content_length  # noqa
+            self._content_length = content_length
+        return self._content_length
 
     @property
     def method(self) -> str:
@@ -157,11 +218,22 @@ class BaseRequest:
         :return:
         """
         if self._cookies is None:
-            self._cookies = SimpleCookie(self.headers.get('COOKIE', ''))
+            cookie = self.headers.get('COOKIE', '')
+            cache = get_cookie_cache() if cookie else None
+            if cache is None:
+                self._cookies = parse_cookie(cookie)
+            else:
+                # 同一个浏览器会重复发送相同的Cookie
+                cookies = cache.get(cookie)
+                if cookies is None:
+                    cookies = parse_cookie(cookie)
+                    cache.set(cookie, cookies)
+                # 返回副本 防止缓存中的结果被修改
+                self._cookies = dict(cookies)
         return self._cookies
 
     def close(self):
-        if getattr(self, '_form', None) is not None:
+        if self._form is not None:
             self._form.close()
 
     def remote_address(self, pre_proxy_number=1) -> str:
@@ -190,22 +262,30 @@ class BaseRequest:
 
 
 class Request(BaseRequest):
+    __slots__ = ()
+
     def __init__(self, environ: dict):
         super(Request, self).__init__(environ)
 
 
+@lru_cache(maxsize=None)
+def get_cookie_cache() -> t.Optional[LRUCache]:
+    """
+    原始Cookie请求头 --> 解析结果 的缓存 COOKIE_CACHE_SIZE为0时不使用缓存
+    """
+    return LRUCache(conf.COOKIE_CACHE_SIZE) if conf.COOKIE_CACHE_SIZE else None
+
+
 def parse_headers(environ: dict) -> tuple:
     """
     解析HTTP头
+    environ中的值已经是WSGI规定的latin-1字符串 直接使用即可 不需要再次编码解码
     :param environ: WSGI environ
-    :return: dict
+    :return: (请求头名称, 值)
     """
     for header_name, header_value in environ.items():
         # 判断是否以HTTP_开头
         if header_name.startswith('HTTP_'):
-            header = (header_name.split('HTTP_', 1)[-1], header_value)
-        elif header_name in ['CONTENT_TYPE', 'CONTENT_LENGTH']:
-            header = (header_name, header_value)
-        else:
-            continue
-        yield header
+            yield header_name[5:], header_value
+        elif header_name == 'CONTENT_TYPE' or header_name == 'CONTENT_LENGTH':
+            yield header_name, header_value
@@ -1,19 +1,27 @@
 import os
 import re
-import json
 import typing as t
+import contextvars
+from uuid import uuid4
 from urllib.parse import quote
 from mimetypes import guess_type
 from vank.core.config import conf
 from email.utils import formatdate
 from http.cookies import SimpleCookie
 from vank.core.http import http_status_dict
+from vank.utils.stream import FileRange
 from vank.utils.datastructures import Headers
+from vank.utils.parsers import parse_range_header
+from vank.utils.json_backend import get_json_backend
+from vank.core.context import _request_context_var, unbound
+from vank.core.http.conditional import check_conditions, file_etag
 
 
 class BaseResponse:
+    # 每个请求都会创建一个实例 使用__slots__减少内存分配
+    __slots__ = ('_status', '_charset', '_content', '_body', '_raw_headers', '_headers', '_cookies', '_media_type')
     default_status = 200
-    media_type = 'text/plain'
+    default_media_type = 'text/plain'
 
     def __init__(self,
                  content: t.Optional[t.Union[bytes, str]] = b"",
@@ -29,20 +37,35 @@ class BaseResponse:
         self._raw_headers = headers
         self._headers = None
         self._cookies = None
-        self.media_type = media_type or self.media_type
+        self._media_type = media_type
+
+    @property
+    def media_type(self) -> str:
+        return self._media_type or self.default_media_type
+
+    @media_type.setter
+    def media_type(self, media_type: str):
+        self._media_type = media_type
 
     @property
     def body(self):
-        if getattr(self, '_body') is None:
+        if self._body is None:
             if isinstance(self._content, bytes):
                 self._body = self._content
             else:
                 self._body = self._content.encode(self.charset)
         return self._body
 
+    @body.setter
+    def body(self, body: bytes):
+        self._body = body
+        # 响应头已经生成时需要同时更新Content-Length
+        if self._headers is not None and 'Content-Length' in self._headers:
+            self._headers.update('Content-Length', str(len(body)))
+
     @property
     def headers(self):
-        if getattr(self, '_headers') is None:
+        if self._headers is None:
             if not self._raw_headers:
                 self._headers = Headers()
             elif isinstance(self._raw_headers, Headers):
@@ -63,7 +86,7 @@ class BaseResponse:
 
     @property
     def charset(self):
-        if getattr(self, '_charset') is None:
+        if self._charset is None:
             pattern = re.compile(r';\s*charset=(?P<charset>[^\s;]+)', re.I)
             res = pattern.search(self.headers.get('Content-Type', ''))
             if not res:
@@ -79,6 +102,19 @@ class BaseResponse:
     def __iter__(self):
         yield from [self.body]
 
+    def get_app_iter(self, environ: dict) -> t.Iterable[bytes]:
+        """
+        交给WSGI服务器的可迭代对象
+        """
+        return self
+
+    def call_on_close(self, callback: t.Callable):
+        """
+        响应不再需要请求时调用callback 用于释放请求的资源
+        普通响应在视图返回时已经生成了响应体 所以立即调用
+        """
+        callback()
+
     def add_cookie(self,
                    key: str,
                    value: t.Optional[str] = "",
@@ -131,12 +167,14 @@ class BaseResponse:
 
     @property
     def cookies(self):
-        if getattr(self, '_cookies') is None:
+        if self._cookies is None:
             self._cookies = SimpleCookie()
         return self._cookies
 
 
 class ResponsePlain(BaseResponse):
+    __slots__ = ()
+
     def __init__(self,
                  content: t.Optional[t.Union[bytes, str]] = b"",
                  status=200,
@@ -158,6 +196,7 @@ class Response404(BaseResponse):
     """
     资源未找到 404
     """
+    __slots__ = ()
     default_status = 404
 
 
@@ -165,20 +204,47 @@ class Response403(BaseResponse):
     """
     403 Forbidden
     """
+    __slots__ = ()
     default_status = 403
 
 
+class Response304(BaseResponse):
+    """
+    Not modified 304
+    """
+    __slots__ = ()
+    default_status = 304
+
+
 class Response400(BaseResponse):
     """
     Bad request 400
     """
+    __slots__ = ()
     default_status = 400
 
 
+class Response413(BaseResponse):
+    """
+    Request entity too large 413
+    """
+    __slots__ = ()
+    default_status = 413
+
+
+class Response412(BaseResponse):
+    """
+    Precondition failed 412
+    """
+    __slots__ = ()
+    default_status = 412
+
+
 class Response500(BaseResponse):
     """
     server 500 响应
     """
+    __slots__ = ()
     default_status = 500
 
 
@@ -186,6 +252,7 @@ class Response405(BaseResponse):
     """
     Method not allowed 响应
     """
+    __slots__ = ()
     default_status = 405
 
     def __init__(self, allow, *args, **kwargs):
@@ -200,33 +267,114 @@ class Response405(BaseResponse):
 
 
 class ResponseStreaming(BaseResponse):
-    def __init__(self, stream: bytes,
+    """
+    流响应
+    content可以是任意产生bytes或str的可迭代对象(例如生成器) 每产生一块就交给WSGI服务器发送
+    长度未知 所以不设置Content-Length 服务器可以使用分块传输
+    生成器在视图所在的上下文中执行 其中仍然可以使用request 请求的资源在迭代结束后才会释放
+    例如:
+     def export():
+         def rows():
+             for row in cursor:
+                 yield f'{row.id},{row.name}\\n'
+         return ResponseStreaming(rows(), media_type='text/csv')
+    """
+    __slots__ = ('iterable', 'iterator', 'context', 'close_callbacks')
+
+    def __init__(self, stream: t.Union[bytes, str, t.Iterable[t.Union[bytes, str]]],
                  *args,
                  **kwargs):
         """
         流响应
-        :param stream:二进制数据
+        :param stream: 可迭代对象 也可以是完整的bytes或str
         :param args:
         :param kwargs:
         """
-        super(ResponseStreaming, self).__init__(stream, *args, **kwargs)
+        if isinstance(stream, (bytes, str)):
+            content, self.iterable = stream, None
+        else:
+            content, self.iterable = b"", stream
+        self.iterator = None
+        # 复制视图所在的上下文 Application在返回响应后会重置request
+        self.context = contextvars.copy_context()
+        self.close_callbacks = []
+        super(ResponseStreaming, self).__init__(content, *args, **kwargs)
+
+    def call_on_close(self, callback: t.Callable):
+        self.close_callbacks.append(callback)
+
+    def __iter__(self):
+        if self.iterator is None:
+            self.iterator = iter([self.body] if self.iterable is None else self.context.run(iter, self.iterable))
+        return self
+
+    def __next__(self) -> bytes:
+        if self.iterator is None:
+            iter(self)
+        while True:
+            try:
+                chunk = self.context.run(next, self.iterator)
+            except StopIteration:
+                # 迭代结束后立即释放请求的资源 不依赖WSGI服务器调用close
+                self.close()
+                raise
+            if isinstance(chunk, str):
+                chunk = chunk.encode(self.charset)
+            # 空的块对于WSGI服务器没有意义
+            if chunk:
+                return chunk
+
+    def close(self):
+        """
+        由WSGI服务器在迭代结束或者客户端断开连接后调用
+        """
+        try:
+            close = getattr(self.iterator, 'close', None)
+            if close is not None:
+                self.context.run(close)
+        finally:
+            callbacks, self.close_callbacks = self.close_callbacks, []
+            for callback in callbacks:
+                callback()
 
 
 class ResponseFile(BaseResponse):
     """
-    将文件根据chunk_size以块的方式读入到内存当中,
+    文件响应
+    服务器提供wsgi.file_wrapper时将打开的文件交给服务器 服务器可以使用sendfile由内核直接复制
+    否则根据chunk_size以块的方式读入到内存当中
+    根据当前请求的条件请求头返回304或412 根据Range与If-Range请求头返回206(一个或多个范围)或416
     """
-    chunk_size = 2048
-    media_type = 'application/octet-stream'
-
-    def __init__(self, filepath: str, filename=None, as_attachment=True, media_type=None, *args, **kwargs):
+    __slots__ = (
+        'as_attachment', 'filepath', 'filename', 'user_media_type', 'file_size', 'last_modified', 'ranges', 'boundary',
+    )
+    # 每块的字节数 为None时使用配置FILE_CHUNK_SIZE
+    chunk_size = None
+    # Range请求头中最多允许的范围数量 超过时忽略Range返回整个文件
+    max_ranges = 32
+    # 这些状态码的响应不发送文件内容
+    empty_body_statuses = (304, 412, 416)
+    default_media_type = 'application/octet-stream'
+
+    def __init__(self, filepath: str, filename=None, as_attachment=True, media_type=None, *args,
+                 accept_ranges=True, conditional=True, **kwargs):
         assert not kwargs.get('content', None), 'This response should not have the "content" parameter'
         self.as_attachment = as_attachment
         self.filepath = os.path.abspath(filepath)
         self.filename = filename
         self.user_media_type = media_type
+        self.file_size = 0
+        self.last_modified = None
+        # [(start, stop)] 多个范围时为[(start, stop, 该部分的头)] 为None时返回整个文件 为空列表时返回416
+        self.ranges = None
+        # 多个范围时multipart/byteranges的分隔符
+        self.boundary = None
         super(ResponseFile, self).__init__(*args, **kwargs)
         self.update_headers()
+        if conditional:
+            self.update_conditional()
+        if accept_ranges:
+            self.update_ranges()
 
     def update_headers(self):
         # 判断文件是否存在 如果不存在那么raise FileNotFoundError
@@ -237,9 +385,11 @@ class ResponseFile(BaseResponse):
         # 获取文件的统计信息
         stat = os.stat(self.filepath)
         # 根据统计信息的st_size 可以获取到文件的长度
-        content_length = stat.st_size
+        self.file_size = content_length = stat.st_size
         # 获取最后修改时间
+        self.last_modified = stat.st_mtime
         last_modified = formatdate(stat.st_mtime, usegmt=True)
+        etag = file_etag(self.filepath, stat)
         if self.filename:
             # attachment 和 inline 可以控制浏览器的行为 attachment 是作为附件下载 而 inline 是作为普通网页取浏览
             disposition_type = 'attachment' if self.as_attachment else 'inline'
@@ -260,44 +410,164 @@ class ResponseFile(BaseResponse):
         self.headers.update('Content-Length', str(content_length))
         self.headers.update('Last-Modified', last_modified)
         self.headers.update('Content-Disposition', content_disposition)
+        if etag:
+            self.headers.update('ETag', etag)
         if content_type:  # guess_type 时 content_type 可能为None
             self.headers.update('Content-Type', content_type)
 
+    def update_conditional(self):
+        """
+        根据当前请求的条件请求头返回304或412 此时不需要读取文件
+        """
+        current_request = _request_context_var.get()
+        if current_request is unbound or self._status != 200:
+            return
+        status = check_conditions(
+            current_request.method, current_request.headers, self.headers.get('ETag'), self.last_modified
+        )
+        if status == 304:
+            self._status = status
+            self.headers.remove('Content-Length')
+        elif status == 412:
+            self._status = status
+            self.headers.update('Content-Length', '0')
+
+    def update_ranges(self):
+        """
+        根据当前请求的Range与If-Range请求头设置响应的范围
+        https://developer.mozilla.org/zh-CN/docs/Web/HTTP/Range_requests
+        """
+        self.headers.update('Accept-Ranges', 'bytes')
+        current_request = _request_context_var.get()
+        if current_request is unbound or self._status != 200 or current_request.method not in ('GET', 'HEAD'):
+            return
+        range_header = current_request.headers.get('RANGE')
+        if not range_header:
+            return
+        # If-Range与当前的文件不匹配时说明文件已经改变 需要返回整个文件
+        if_range = current_request.headers.get('IF_RANGE')
+        if if_range and not self.if_range_matches(if_range):
+            return
+        ranges = parse_range_header(range_header, self.file_size)
+        if ranges is None or len(ranges) > self.max_ranges:
+            return
+        self.ranges = ranges
+        if not ranges:
+            self._status = 416
+            self.headers.update('Content-Range', f'bytes */{self.file_size}')
+            self.headers.update('Content-Length', '0')
+            return
+        self._status = 206
+        if len(ranges) == 1:
+            start, stop = ranges[0]
+            self.headers.update('Content-Range', f'bytes {start}-{stop - 1}/{self.file_size}')
+            self.headers.update('Content-Length', str(stop - start))
+            return
+        self.boundary = uuid4().hex
+        # 每个部分的请求头使用文件本身的Content-Type
+        part_type = self.headers.get('Content-Type')
+        self.headers.update('Content-Type', f'multipart/byteranges; boundary={self.boundary}')
+        content_length = len(self.multipart_end())
+        for start, stop in ranges:
+            content_length += len(self.multipart_header(start, stop, part_type)) + stop - start + 2
+        self.headers.update('Content-Length', str(content_length))
+        self.ranges = [(start, stop, self.multipart_header(start, stop, part_type)) for start, stop in ranges]
+
+    def if_range_matches(self, if_range: str) -> bool:
+        """
+        If-Range可以是ETag或者Last-Modified 只有强验证器完全相同时才返回范围
+        """
+        if if_range.startswith(('"', 'W/')):
+            etag = self.headers.get('ETag')
+            return bool(etag) and not etag.startswith('W/') and etag == if_range
+        return if_range == self.headers.get('Last-Modified')
+
+    def multipart_header(self, start: int, stop: int, part_type: str) -> bytes:
+        return (
+            f'--{self.boundary}\r\n'
+            f'Content-Type: {part_type}\r\n'
+            f'Content-Range: bytes {start}-{stop - 1}/{self.file_size}\r\n\r\n'
+        ).encode('latin-1')
+
+    def multipart_end(self) -> bytes:
+        return f'--{self.boundary}--\r\n'.encode('latin-1')
+
+    @property
+    def block_size(self) -> int:
+        return self.chunk_size or conf.FILE_CHUNK_SIZE
+
+    def open(self) -> t.BinaryIO:
+        return open(self.filepath, 'rb')
+
+    def get_app_iter(self, environ: dict) -> t.Iterable[bytes]:
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        # 多个范围需要在文件内容之间插入分隔符 只能按块迭代
+        if (
+                file_wrapper is None
+                or self._status in self.empty_body_statuses
+                or (self.ranges is not None and len(self.ranges) != 1)
+        ):
+            return self
+        f = self.open()
+        if self.ranges is None:
+            return file_wrapper(f, self.block_size)
+        start, stop = self.ranges[0]
+        f.seek(start)
+        return file_wrapper(FileRange(f, stop - start, self.block_size), self.block_size)
+
+    def iter_range(self, f, start: int, stop: int) -> t.Iterator[bytes]:
+        f.seek(start)
+        remaining = stop - start
+        while remaining > 0:
+            chunk = f.read(min(self.block_size, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
     def __iter__(self):
-        with open(self.filepath, 'rb') as f:
-            while 1:
-                chunk = f.read(self.chunk_size)
-                if not chunk:
-                    yield b""
-                    break
-                yield chunk
+        if self._status in self.empty_body_statuses:
+            return
+        with self.open() as f:
+            if self.ranges is None:
+                while 1:
+                    chunk = f.read(self.block_size)
+                    if not chunk:
+                        break
+                    yield chunk
+            elif len(self.ranges) == 1:
+                yield from self.iter_range(f, *self.ranges[0])
+            else:
+                for start, stop, header in self.ranges:
+                    yield header
+                    yield from self.iter_range(f, start, stop)
+                    yield b'\r\n'
+                yield self.multipart_end()
 
 
 class ResponseRedirect(BaseResponse):
+    __slots__ = ()
     default_status = 301
 
     def __init__(self, url, permanent=True, *args, **kwargs):
-        # 判断是否永久重定向 301为永久重定向
-        if not permanent:
-            self.default_status = 302
         super(ResponseRedirect, self).__init__(*args, **kwargs)
+        # 判断是否永久重定向 301为永久重定向
+        if not permanent and self._status == self.default_status:
+            self._status = 302
 
         self.headers.update('Location', quote(url, safe="/#%[]=:;$&()+,!?*@'~"))
 
 
 class ResponseJson(BaseResponse):
-    media_type = f'application/json'
+    __slots__ = ()
+    default_media_type = 'application/json'
 
     def __init__(self, content: t.Any, *args, **kwargs):
-        content = json.dumps(
-            content,
-            allow_nan=False,
-            indent=None,
-            separators=(",", ":"),  # 获得最紧凑的json
-        )
-
+        # 编解码器由JSON_BACKEND决定 返回bytes时不需要再次编码
+        content = get_json_backend().dumps(content)
         super(ResponseJson, self).__init__(content, *args, **kwargs)
 
 
 class ResponseHtml(BaseResponse):
-    media_type = "text/html"
+    __slots__ = ()
+    default_media_type = "text/html"
@@ -0,0 +1,150 @@
+# @FileName: cache.py
+# @Date    : 2026/10/18-13:40
+# @Author  : vank
+# @Project : vank
+import os
+import sys
+import json
+import inspect
+import typing as t
+from logging import getLogger
+from functools import lru_cache
+from vank.core.config import conf
+from vank.__version__ import __version__
+
+"""
+预编译的路由表缓存
+通过 python -m vank routes --compile 生成 在配置ROUTE_CACHE_FILE中指定路径
+缓存中记录了每条路由处理好的数据(路由规则的解析结果、路由段、url模板与正则)、已经校验过参数的视图以及不需要参数绑定器的视图
+启动时如果缓存仍然有效(vank版本、缓存格式、转换器配置以及视图所在文件都没有改变) 那么将跳过这些解析和检查
+"""
+
+# 缓存文件的格式版本 缓存的内容改变时需要增加
+CACHE_FORMAT = 2
+
+logger = getLogger('console')
+
+
+def get_view_key(view_func, variables: t.Iterable[str]) -> str:
+    """
+    视图在缓存中的键 由视图的导入路径和路由的变量名组成
+    """
+    view = view_func if inspect.isfunction(view_func) else type(view_func)
+    return f'{view.__module__}:{view.__qualname__}:{",".join(sorted(variables))}'
+
+
+def get_view_file(view_func) -> t.Optional[str]:
+    """
+    获取视图所在的文件
+    """
+    view = view_func if inspect.isfunction(view_func) else type(view_func)
+    return getattr(sys.modules.get(view.__module__), '__file__', None)
+
+
+def has_binder(view_func) -> bool:
+    """
+    视图是否有参数绑定器(见vank.core.binding) 类视图的任意一个类方法有绑定器即可
+    """
+    if inspect.isfunction(view_func):
+        return hasattr(view_func, 'binder')
+    return any(hasattr(handler, 'binder') for handler in view_func.method_handlers.values())
+
+
+def get_file_stat(filepath: str) -> list:
+    stat = os.stat(filepath)
+    return [stat.st_mtime_ns, stat.st_size]
+
+
+class RouteCache:
+    def __init__(self,
+                 rules: t.Optional[dict] = None,
+                 views: t.Optional[t.Iterable[str]] = None,
+                 unbound_views: t.Optional[t.Iterable[str]] = None):
+        # 路由规则 --> Route.dump()的结果
+        self.rules = rules or {}
+        # 已经校验过参数的视图
+        self.views = set(views or ())
+        # 不需要参数绑定器的视图 注册时不需要再检查签名和类型注解
+        self.unbound_views = set(unbound_views or ())
+        # 视图所在文件以及配置文件 这些文件改变后缓存将失效
+        self.files = set()
+
+    def has_view(self, view_func, variables: t.Iterable[str]) -> bool:
+        return get_view_key(view_func, variables) in self.views
+
+    def is_unbound_view(self, view_func, variables: t.Iterable[str]) -> bool:
+        return get_view_key(view_func, variables) in self.unbound_views
+
+    @classmethod
+    def from_router(cls, router) -> "RouteCache":
+        """
+        根据路由表构建缓存
+        """
+        cache = cls()
+        cache.files.add(getattr(conf.module, '__file__', None))
+        for route in router.routes:
+            cache.rules[route.route_path] = route.dump()
+            view_func = router.endpoint_func_dic.get(route.endpoint)
+            view_key = get_view_key(view_func, route.argument_converters.keys())
+            cache.views.add(view_key)
+            if not has_binder(view_func):
+                cache.unbound_views.add(view_key)
+            cache.files.add(get_view_file(view_func))
+        return cache
+
+    def dump(self, filepath: str):
+        """
+        将缓存写入文件 同时记录视图所在文件以及配置文件的修改时间和大小 用于判断缓存是否有效
+        """
+        data = dict(
+            version=__version__,
+            format=CACHE_FORMAT,
+            converters=conf.ROUTE_CONVERTERS,
+            files={source_file: get_file_stat(source_file) for source_file in self.files if source_file},
+            rules=self.rules,
+            views=sorted(self.views),
+            unbound_views=sorted(self.unbound_views),
+        )
+        with open(filepath, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+
+    @classmethod
+    def load(cls, filepath: str) -> t.Optional["RouteCache"]:
+        """
+        从文件中加载缓存 缓存无效时返回None
+        """
+        try:
+            with open(filepath, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            logger.warning(f'Failed to load the route cache "{filepath}"')
+            return None
+        if (
+                data.get('version') != __version__
+                or data.get('format') != CACHE_FORMAT
+                or data.get('converters') != conf.ROUTE_CONVERTERS
+        ):
+            return cls.out_of_date(filepath)
+        for source_file, stat in data.get('files', {}).items():
+            try:
+                if get_file_stat(source_file) != stat:
+                    return cls.out_of_date(filepath)
+            except OSError:
+                return cls.out_of_date(filepath)
+        return cls(data.get('rules'), data.get('views'), data.get('unbound_views'))
+
+    @staticmethod
+    def out_of_date(filepath: str):
+        logger.warning(f'The route cache "{filepath}" is out of date, '
+                       f'you can rebuild it through "python -m vank routes --compile"')
+        return None
+
+
+@lru_cache(maxsize=None)
+def get_route_cache() -> t.Optional[RouteCache]:
+    """
+    获取预编译的路由表缓存 没有配置ROUTE_CACHE_FILE或缓存无效时返回None
+    """
+    if not conf.ROUTE_CACHE_FILE:
+        return None
+    return RouteCache.load(str(conf.ROUTE_CACHE_FILE))
@@ -0,0 +1,104 @@
+# @FileName: combined.py
+# @Date    : 2026/10/18-11:03
+# @Author  : vank
+# @Project : vank
+import re
+import typing as t
+from vank.core.routing.tree import build_parts_regex, NO_MATCH
+
+"""
+将所有路由的正则合并为一条正则 每个路由作为一个带有命名分组的分支
+匹配时只需要调用一次re.match 再通过lastgroup得到匹配到的路由
+由于正则的分支是按顺序尝试的 所以依然保持先注册的路由优先的规则
+"""
+
+
+class CombinedPattern:
+    def __init__(self):
+        self._routes = []
+        # 合并后的正则 路由发生改变后置为None 在下一次匹配时重新构建
+        self._pattern = None
+        # 分支的分组名 --> (第一个路由的位置, 请求方法 --> (位置, 路由), 第一个路由, [(变量名, 分组名)])
+        self._groups = {}
+        # 以下两项用于在不重新构建正则的情况下查找所有匹配的路由
+        # 含参数的路由 [(位置, 路由)]
+        self._dynamic_routes = []
+        # 不含参数的路由 path --> [(位置, 路由)]
+        self._static_routes = {}
+
+    def insert(self, route):
+        """
+        添加路由 合并后的正则将会在下一次匹配时重新构建
+        """
+        if route.argument_converters:
+            self._dynamic_routes.append((len(self._routes), route))
+        else:
+            self._static_routes.setdefault(route.route_path, []).append((len(self._routes), route))
+        self._routes.append(route)
+        self._pattern = None
+
+    def build(self):
+        """
+        构建合并后的正则
+        相同路由规则的路由合并为一个分支 由该分支的请求方法映射表选择路由
+        """
+        alternatives = []
+        groups = {}
+        for position, route in enumerate(self._routes):
+            group = groups.get(route.route_path)
+            if group is not None:
+                for method in route.methods:
+                    group[1].setdefault(method, (position, route))
+                continue
+            group_name = f'r{len(alternatives)}'
+            regex = '/'.join(build_parts_regex(parts, f'{group_name}_') for parts in route.segments)
+            # 外层的分组最后闭合 所以匹配成功后lastgroup就是该分支的分组名
+            alternatives.append(f'(?P<{group_name}>{regex})\\Z')
+            groups[route.route_path] = (
+                position,
+                {method: (position, route) for method in route.methods},
+                route,
+                [(variable, f'{group_name}_{variable}') for variable in route.argument_converters]
+            )
+        self._groups = {f'r{number}': group for number, group in enumerate(groups.values())}
+        self._pattern = re.compile('|'.join(alternatives) or '(?!)')
+
+    def lookup(self, path: str, method: t.Optional[str] = None) -> t.Optional[t.Tuple[t.Any, dict]]:
+        """
+        查找与path匹配、允许该请求方法且最早注册的路由
+        :param path: 请求路径
+        :param method: 请求方法 为None时不检查请求方法
+        :return: (路由, 类型转换后的参数) 未找到时返回None 没有任何分支匹配时返回NO_MATCH
+        """
+        if self._pattern is None:
+            self.build()
+        res = self._pattern.match(path)
+        if not res:
+            return NO_MATCH
+        first_position, method_routes, first_route, variables = self._groups[res.lastgroup]
+        if method is None:
+            arguments = {variable: res.group(group_name) for variable, group_name in variables}
+            return first_route, first_route.convert_arguments(**arguments)
+        position, route = method_routes.get(method, (len(self._routes), None))
+        # 分支中的路由与分支中第一个路由之间可能存在其他允许该请求方法的路由 它们的优先级更高
+        # 通常相同路由规则的路由是连续注册的 此时不需要额外的查找
+        for other_route in self._routes[first_position + 1:position]:
+            if method not in other_route.method_set:
+                continue
+            other_res = other_route.route_pattern.fullmatch(path)
+            if other_res:
+                return other_route, other_route.convert_arguments(**other_res.groupdict())
+        if route is None:
+            return None
+        arguments = {variable: res.group(group_name) for variable, group_name in variables}
+        return route, route.convert_arguments(**arguments)
+
+    def match_all(self, path: str) -> list:
+        """
+        查找所有与path匹配的路由 不检查请求方法 用于获取允许的请求方法
+        :return: 按注册顺序排列的路由
+        """
+        found = self._static_routes.get(path, []) + [
+            (position, route) for position, route in self._dynamic_routes if route.route_pattern.fullmatch(path)
+        ]
+        return [route for position, route in sorted(found, key=lambda item: item[0])]
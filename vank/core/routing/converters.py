@@ -12,6 +12,13 @@ from abc import ABCMeta, abstractmethod
 class BasicConverter(metaclass=ABCMeta):
     regex = None
     name = ""
+    # regex是否可能匹配到'/' 即该转换器能否跨越多个路由段 例如PathConverter
+    # 为None时表示未知 路由树会像路由正则一样用regex匹配请求路径的剩余部分 结果正确但是无法逐段查找
+    # 确定regex不会匹配到'/'的转换器应当设为False 以便路由树逐段匹配
+    multi_segment = None
+    # 可选的原生匹配方法 match_segment(value) 校验value并转换为Python Object
+    # 不匹配时返回None 提供此方法时路由树将不再使用regex匹配
+    match_segment = None
 
     def __init__(self):
         assert self.name, "You must configure a name for the route converter"
@@ -39,10 +46,15 @@ class BasicConverter(metaclass=ABCMeta):
 class IntConverter(BasicConverter):
     regex = r"\d+"
     name = 'int'
+    multi_segment = False
 
     def convert_to_python(self, value):
         return int(value)
 
+    def match_segment(self, value):
+        # str.isdecimal 与正则中的 \d 匹配的字符相同
+        return int(value) if value.isdecimal() else None
+
     def convert_to_url(self, value):
         return str(value)
 
@@ -51,18 +63,24 @@ class IntConverter(BasicConverter):
 class StrConverter(BasicConverter):
     regex = r'[^/]+'
     name = 'str'
+    multi_segment = False
 
     def convert_to_python(self, value):
         return str(value)
 
+    def match_segment(self, value):
+        # 路由段中不会出现'/'
+        return value or None
+
     def convert_to_url(self, value):
         return str(value)
 
 
 # 浮点数转换器
 class FloatConverter(BasicConverter):
-    regex = r"[0-9]+(.[0-9]+)?"
+    regex = r"[0-9]+(\.[0-9]+)?"
     name = 'float'
+    multi_segment = False
 
     def convert_to_python(self, value):
         return float(value)
@@ -75,6 +93,7 @@ class FloatConverter(BasicConverter):
 class EmailConverter(BasicConverter):
     regex = r'[A-Za-z0-9\u4e00-\u9fa5]+@[a-zA-Z0-9_-]+(\.[a-zA-Z0-9_-]+)+'
     name = 'email'
+    multi_segment = False
 
     def convert_to_python(self, value):
         return str(value)
@@ -87,6 +106,7 @@ class EmailConverter(BasicConverter):
 class UUIDConverter(BasicConverter):
     regex = '[0-9a-f]{8}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{4}-[0-9a-f]{12}'
     name = 'uuid'
+    multi_segment = False
 
     def convert_to_python(self, value):
         return UUID(value)
@@ -98,9 +118,14 @@ class UUIDConverter(BasicConverter):
 class PathConverter(BasicConverter):
     regex = '.*'
     name = 'path'
+    multi_segment = True
 
     def convert_to_python(self, value):
         return str(value)
 
+    def match_segment(self, value):
+        # '.'不匹配换行符
+        return None if '\n' in value else value
+
     def convert_to_url(self, value):
         return str(value)
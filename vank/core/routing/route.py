@@ -3,16 +3,22 @@
 # @Author:  vank
 import re
 import inspect
-from urllib.parse import quote
+from urllib.parse import quote, urlencode
 from functools import lru_cache
 from vank.core import exceptions
 from vank.core.config import conf
 from vank.utils.load_module import import_from_str
+from vank.core.routing.cache import get_route_cache
+from vank.core.routing.tree import segment_key
 
 # 构建路由正则
 build_route_regex_pattern = re.compile(
     "(?P<static_route>[^{]*){(?P<variable>[a-zA-Z_][a-zA-Z0-9_]*):(?P<converter>[a-zA-Z_][a-zA-Z0-9_]*)}"
 )
+# 反向构建url时 路由规则中的静态部分不需要转义的字符
+STATIC_SAFE_CHARS = "/#%[]=:;$&()+,!?*@'~"
+# 反向构建url时 参数的值不需要转义的字符
+VALUE_SAFE_CHARS = "/:@!$&'()*+,;=~"
 
 
 def parse_route_rule(rule):
@@ -50,12 +56,27 @@ def get_converters():
 
 
 class BaseRoute:
+    __slots__ = (
+        'regex', '_route_pattern', 'route_path', 'methods', 'method_set', 'endpoint', 'regex_list', 'rule_parts',
+        'segments', 'segment_keys', 'url_parts', 'converters', 'argument_converters',
+    )
+
     def __init__(self, route_path: str, methods: list, endpoint: str, *args, **kwargs):
-        self.route_pattern = None  # 解析后的路由规则
+        self.regex = None  # 解析后的路由规则
+        self._route_pattern = None  # 编译后的路由规则 在第一次使用时编译
         self.route_path = route_path  # 用户定义的路由规则
         self.methods = self.__parse_methods(methods)  # 路由的method
+        self.method_set = frozenset(self.methods)  # 用于快速判断请求方法是否允许
         self.endpoint = endpoint  # 端点
         self.regex_list = []
+        # parse_route_rule的解析结果 [(静态路由, 变量名, 转换器名称)]
+        self.rule_parts = []
+        # 按'/'切分后的路由段 每一段由静态字符串和(变量名, 转换器)组成 供路由树使用
+        self.segments = [[]]
+        # 每个路由段在路由树中的键
+        self.segment_keys = []
+        # 反向构建url的模板 由转义后的静态字符串和(变量名, 转换器)组成
+        self.url_parts = []
         # 转换器类型
         self.converters = get_converters()
         # 参数所对应的转换器
@@ -82,25 +103,89 @@ class BaseRoute:
         创建一条属于这条路由的正则
         :return:
         """
-        for static_route, variable, converter_name in parse_route_rule(self.route_path):
+        # 预编译的路由表缓存中保存了处理好的路由段、url模板与正则 只需要还原其中的转换器
+        route_cache = get_route_cache()
+        prepared = route_cache and route_cache.rules.get(self.route_path)
+        if prepared is not None:
+            self.restore(prepared)
+            return
+        self.rule_parts = list(parse_route_rule(self.route_path))
+        for static_route, variable, converter_name in self.rule_parts:
             # 需要将静态路径escape防止出现转义安全问题
             # 例如 直接拼接'/foo.bar'这段规则到路由正则中，那么匹配'/fooobar'也能通过匹配,这是不合法的
             self.regex_list.append(re.escape(static_route))
+            if static_route:
+                # 为了解决URL规范问题需要对静态部分进行quote
+                # safe参数指的是不对safe的值进行转换
+                self.url_parts.append(quote(static_route, safe=STATIC_SAFE_CHARS))
+            # 静态路径中每出现一个'/'就开始一个新的路由段
+            for index, chunk in enumerate(static_route.split('/')):
+                if index:
+                    self.segments.append([])
+                if chunk:
+                    self.segments[-1].append(chunk)
             # ===处理动态路由===
             if converter_name is None:
                 continue
             if variable in self.argument_converters.keys():
                 raise SyntaxError(f"Duplicate keyword parameters '{variable}' cannot appear in same route path")
-            converter = self.converters.get(converter_name, None)
-            if converter is None:
-                raise SyntaxError(f" Converter '{converter_name}' does not exist.")
+            converter = self.get_converter(converter_name)
             # 将变量名对应的转换器添加到字典中,在路由过来的时候以便转换为相应的类型
             self.argument_converters.update({variable: converter})
+            self.segments[-1].append((variable, converter))
+            self.url_parts.append((variable, converter))
             self.regex_list.append(f"(?P<{variable}>{converter.regex})")
+        self.segment_keys = [segment_key(parts) for parts in self.segments]
         # 开始拼接解析后的路由规则
-        regex = f"^{''.join(self.regex_list)}$"
+        self.regex = f"^{''.join(self.regex_list)}$"
+
+    def get_converter(self, converter_name: str):
+        converter = self.converters.get(converter_name, None)
+        if converter is None:
+            raise SyntaxError(f" Converter '{converter_name}' does not exist.")
+        return converter
+
+    def dump(self) -> dict:
+        """
+        将处理好的路由数据转换为可以写入路由表缓存的形式 转换器只保存变量名
+        """
+
+        def dump_part(part):
+            return part if isinstance(part, str) else [part[0]]
+
+        return dict(
+            rule_parts=self.rule_parts,
+            segments=[[dump_part(part) for part in parts] for parts in self.segments],
+            segment_keys=self.segment_keys,
+            url_parts=[dump_part(part) for part in self.url_parts],
+            regex=self.regex,
+        )
 
-        self.route_pattern = re.compile(regex)
+    def restore(self, prepared: dict):
+        """
+        从路由表缓存中还原dump的结果 跳过路由规则的解析以及路由段、路由段的键、url模板和正则的构建
+        """
+        self.rule_parts = [tuple(part) for part in prepared['rule_parts']]
+        for static_route, variable, converter_name in self.rule_parts:
+            if converter_name is not None:
+                self.argument_converters[variable] = self.get_converter(converter_name)
+
+        def restore_part(part):
+            return part if isinstance(part, str) else (part[0], self.argument_converters[part[0]])
+
+        self.segments = [[restore_part(part) for part in parts] for parts in prepared['segments']]
+        self.segment_keys = prepared['segment_keys']
+        self.url_parts = [restore_part(part) for part in prepared['url_parts']]
+        self.regex = prepared['regex']
+
+    @property
+    def route_pattern(self):
+        """
+        编译后的路由规则 路由树匹配时并不需要它 所以在第一次使用时才编译
+        """
+        if self._route_pattern is None:
+            self._route_pattern = re.compile(self.regex)
+        return self._route_pattern
 
     def convert_arguments(self, **arguments):
         """
@@ -114,40 +199,37 @@ class BaseRoute:
 
 
 class Route(BaseRoute):
+    __slots__ = ()
+
     def __init__(self, route_path, methods, endpoint, *args, **kwargs):
         super(Route, self).__init__(route_path, methods, endpoint, *args, **kwargs)
 
     def check_method(self, request_method):
-        return request_method.upper() in self.methods
+        # request.method 已经是大写的了
+        return request_method in self.method_set
 
     def url_reflect(self, endpoint: str, **arguments):
         """
         根据endpoint查找对应的url
         """
         # 根据endpoint反向构建url、并且传入的arguments必须为该路由所需的可变路由参数的超集
-        if not endpoint == self.endpoint or not set(arguments.keys()).issuperset(self.argument_converters.keys()):
+        if not endpoint == self.endpoint or not arguments.keys() >= self.argument_converters.keys():
             raise exceptions.ReflectNotFound(endpoint, **arguments)
-        url = self.route_path
-        # 将传入的arguments替换为url、甚于的参数作为查询参数
-        for variable_name, converter in self.argument_converters.items():
-            value = converter.convert_to_url(arguments.pop(variable_name))
-            raw_rule = '{%(variable_name)s:%(converter_name)s}' % dict(
-                variable_name=variable_name,
-                converter_name=converter.name
-            )
-            url = url.replace(raw_rule, value)
-        query_args = "&".join([f"{key}={value}" for key, value in arguments.items()])
-        if query_args:
-            url = url + f"?{query_args}"
-        # 为了解决URL规范问题需要对route_path进行quote
-        # safe参数指的是不对safe的值进行转换
-        return quote(url, safe="/#%[]=:;$&()+,!?*@'~")
+        # 将传入的arguments填入url模板、剩余的参数作为查询参数
+        url = ''.join([
+            part if isinstance(part, str)
+            else quote(part[1].convert_to_url(arguments.pop(part[0])), safe=VALUE_SAFE_CHARS)
+            for part in self.url_parts
+        ])
+        if arguments:
+            url = f"{url}?{urlencode(arguments, doseq=True)}"
+        return url
 
     def __str__(self):
         return '<{cls_name}>:"{route_path}" <==> "{endpoint}"'.format(
             route_path=self.route_path,
             cls_name=self.__class__.__name__,
-            regex=self.route_pattern,
+            regex=self.regex,
             endpoint=self.endpoint
         )
 
@@ -155,6 +237,6 @@ class Route(BaseRoute):
         return '<{cls_name}>:"{route_path}" <==> "{endpoint}"'.format(
             route_path=self.route_path,
             cls_name=self.__class__.__name__,
-            regex=self.route_pattern,
+            regex=self.regex,
             endpoint=self.endpoint
         )
@@ -1,26 +1,79 @@
+import typing as t
 from vank.core import exceptions
+from vank.core.config import conf
 from vank.core.context import request
 from vank.core.routing.route import Route
+from vank.core.routing.tree import RouteTree, NO_MATCH
+from vank.utils.datastructures import LRUCache
+from vank.utils.load_module import import_from_str
+from vank.core.routing.cache import get_route_cache
+from vank.core.routing.combined import CombinedPattern
 from vank.utils.arguments import contain_arguments, has_key_word_argument
 
+# 内置的路由匹配引擎
+ROUTER_ENGINES = {
+    'tree': RouteTree,
+    'combined': CombinedPattern,
+}
+
+
+def get_router_engine():
+    """
+    根据配置ROUTER_ENGINE获取路由匹配引擎
+    可以是内置引擎的名称 也可以是自定义引擎的导入路径
+    """
+    engine = conf.ROUTER_ENGINE
+    if engine in ROUTER_ENGINES:
+        return ROUTER_ENGINES[engine]
+    if ':' in engine:
+        return import_from_str(engine)
+    raise ValueError(f'Unknown router engine "{engine}", it should be one of {list(ROUTER_ENGINES)} or an import path')
+
+
+def get_first_segment(route) -> t.Optional[str]:
+    """
+    获取路由的第一个路由段 当第一个路由段含有转换器时返回None
+    """
+    parts = route.segments[1]
+    if all(isinstance(part, str) for part in parts):
+        return ''.join(parts)
+    return None
+
 
 class Router:
     def __init__(self):
         self._routes = []
-        self.route_path_set = set()
+        # 路由匹配引擎 用于匹配请求路径
+        self._engine = get_router_engine()()
+        # 子应用前缀的第一个路由段 --> 路由匹配引擎
+        # 请求路径的第一个路由段与之相同时 只在该分区中匹配
+        self._partitions = {}
+        # 不含参数的路由 path --> {method: route} 映射 匹配时优先查找
+        self._static_routes = {}
+        # 路由规则 --> 已经绑定的请求方法 相同的路由规则可以绑定不同的请求方法
+        self.route_path_methods = {}
         # endpoint -->view_func 映射
         self.endpoint_func_dic = {}
+        # endpoint -->route 映射 用于反向构建url
+        self.endpoint_route_dic = {}
+        # (method, path) --> 匹配结果 的缓存 ROUTER_CACHE_SIZE为0时不使用缓存
+        self.match_cache = LRUCache(conf.ROUTER_CACHE_SIZE, admission=True) if conf.ROUTER_CACHE_SIZE else None
 
     def add_route(self, route_path: str, route: "Route", view_func):
         """
         添加路由到路由列表中 同时校验是否有相同路由
         """
-        if route_path in self.route_path_set:
+        bound_methods = self.route_path_methods.setdefault(route_path, set())
+        if not bound_methods.isdisjoint(route.method_set):
             raise ValueError('"%s" This route is already in the router.' % route_path)
         # 不能存在多个相同的endpoint
         if route.endpoint in self.endpoint_func_dic:
             raise ValueError('"%s" This endpoint is already in the router.' % route.endpoint)
+        # 预编译的路由表缓存中记录了已经校验过参数的视图 不需要再通过inspect检查
+        route_cache = get_route_cache()
         if (
+                not (route_cache and route_cache.has_view(view_func, route.argument_converters.keys()))
+                and
                 not contain_arguments(view_func, route.argument_converters.keys())
                 and
                 not has_key_word_argument(view_func)
@@ -28,42 +81,126 @@ class Router:
             raise ValueError(
                 f"You should provide positional parameters such as {','.join(route.argument_converters.keys())}."
                 f" or provide a keyword variable parameter to the view function '{view_func.__name__}'")
-        self.route_path_set.add(route_path)
+        bound_methods.update(route.method_set)
         self._routes.append(route)
+        # 不含参数的路由只有在请求方法没有被之前注册的路由覆盖时才能直接通过path查找
+        # 否则会改变先注册的路由优先的规则
+        if not route.argument_converters:
+            allowed_methods = self._allowed_methods(route_path)
+            method_routes = self._static_routes.setdefault(route_path, {})
+            for method in route.methods:
+                if method not in allowed_methods:
+                    method_routes[method] = route
+        first_segment = get_first_segment(route)
+        if first_segment is None:
+            # 第一个路由段含有转换器的路由可能匹配任意分区的请求 所以需要添加到所有分区中
+            self._engine.insert(route)
+            for engine in self._partitions.values():
+                engine.insert(route)
+        else:
+            self._partitions.get(first_segment, self._engine).insert(route)
         self.endpoint_func_dic[route.endpoint] = view_func
+        self.endpoint_route_dic[route.endpoint] = route
+        # 路由表发生改变 之前缓存的匹配结果可能已经失效
+        if self.match_cache is not None:
+            self.match_cache.clear()
 
     def match(self):
         """
-        需要检查请求方法,需要
+        根据请求方法和请求路径查找视图函数及其参数
+        如果开启了缓存 那么优先从缓存中获取匹配结果(包括404和405)
         :return:
         """
+        method, path = request.method.upper(), request.path
+        if self.match_cache is None:
+            result = self._match(method, path)
+        else:
+            result = self.match_cache.get((method, path))
+            if result is None:
+                result = self._match(method, path)
+                self.match_cache.set((method, path), result)
+        view_function, arguments, allow = result
+        if view_function is not None:
+            # 返回参数的副本 防止缓存中的参数被修改
+            return view_function, dict(arguments)
+        if allow is not None:
+            raise exceptions.MethodNotAllowedException(f'"{method}" Method is not allowed', allow=allow)
+        # 如果路由规则都没有找到那么就报404错误
+        raise exceptions.NotFoundException(f'Resource {path} not found')
 
-        for route in self._routes:
-            # 遍历路由列表并匹配
-            res = route.route_pattern.match(request.path)
-            if not res:
-                continue
-            # 判断请求方法是否允许
-            if not route.check_method(request.method):
-                raise exceptions.MethodNotAllowedException(f'"{request.method.upper()}" Method is not allowed',
-                                                           allow=route.methods)
-            # 获取endpoint和类型转换后的参数
-            endpoint, arguments = route.endpoint, route.convert_arguments(**res.groupdict())
-            view_function = self.endpoint_func_dic.get(endpoint)
-            return view_function, arguments
+    def _match(self, method: str, path: str):
+        """
+        不含参数的路由通过字典直接查找 其余的交给路由匹配引擎查找
+        :return: (视图函数, 类型转换后的参数, 允许的请求方法)
+                 未找到路由时视图函数为None 请求方法不允许时视图函数为None且允许的请求方法不为None
+        """
+        route = self._static_routes.get(path, {}).get(method)
+        if route is not None:
+            arguments = {}
+        else:
+            result = self._lookup(path, method)
+            if result is NO_MATCH:
+                # 路由匹配引擎已经确定没有任何路由与该路径匹配
+                return None, None, None
+            if result is None:
+                # 没有允许该请求方法的路由时 如果有其他路由匹配了该路径 那么请求方法不允许
+                return None, None, self._allowed_methods(path) or None
+            route, arguments = result
+        # 路由匹配引擎返回的参数已经经过类型转换
+        return self.endpoint_func_dic.get(route.endpoint), arguments, None
 
-        # 如果路由规则都没有找到那么就报404错误
-        raise exceptions.NotFoundException(f'Resource {request.path} not found')
+    def _select_engine(self, path: str):
+        """
+        根据请求路径的第一个路由段选择分区
+        """
+        if self._partitions:
+            segments = path.split('/', 2)
+            if len(segments) > 1:
+                return self._partitions.get(segments[1], self._engine)
+        return self._engine
+
+    def _lookup(self, path: str, method: t.Optional[str] = None):
+        """
+        在分区中查找与path匹配、允许该请求方法且最早注册的路由
+        """
+        return self._select_engine(path).lookup(path, method)
+
+    def _allowed_methods(self, path: str) -> list:
+        """
+        获取所有与path匹配的路由所允许的请求方法
+        """
+        allowed_methods = []
+        for route in self._select_engine(path).match_all(path):
+            allowed_methods.extend(method for method in route.methods if method not in allowed_methods)
+        return allowed_methods
+
+    def add_partition(self, prefix: str):
+        """
+        为子应用的前缀创建一个分区 以前缀的第一个路由段作为分区的键
+        之前注册的路由中可能匹配该分区请求的路由会按注册顺序添加到分区中
+        """
+        first_segment = prefix.split('/')[1]
+        if '{' in first_segment or first_segment in self._partitions:
+            return
+        engine = get_router_engine()()
+        for route in self._routes:
+            if get_first_segment(route) in (None, first_segment):
+                engine.insert(route)
+        self._partitions[first_segment] = engine
 
     @property
     def routes(self):
         for route in self._routes:
             yield route
 
-    def include_router(self, router: "Router"):
+    def include_router(self, router: "Router", prefix: t.Optional[str] = None):
         """
         此方法应该由主应用(Application)调用 目的是为了将子应用(SubApplication)的路由注册到主应用中
+        :param router: 子应用的路由
+        :param prefix: 子应用的前缀 提供前缀时子应用的路由会被放在单独的分区中
         """
+        if prefix:
+            self.add_partition(prefix)
         # 遍历子路由的所有路由
         for route in router.routes:
             # 获取路由未构建时的路径
@@ -74,12 +211,10 @@ class Router:
             self.add_route(route_path, route, view_func)
 
     def url_reflect(self, endpoint: str, **arguments):
-        for route in self.routes:
-            try:
-                return route.url_reflect(endpoint, **arguments)
-            except exceptions.ReflectNotFound:
-                pass
-        raise exceptions.ReflectNotFound(endpoint, **arguments)
+        route = self.endpoint_route_dic.get(endpoint)
+        if route is None:
+            raise exceptions.ReflectNotFound(endpoint, **arguments)
+        return route.url_reflect(endpoint, **arguments)
 
     def __str__(self):
         return '\n'.join(
@@ -0,0 +1,226 @@
+# @FileName: tree.py
+# @Date    : 2026/10/18-10:12
+# @Author  : vank
+# @Project : vank
+import re
+import typing as t
+
+"""
+基于路由段的前缀树(radix tree)
+路由规则按'/'切分为路由段 匹配时按请求路径的路由段逐层查找
+静态路由段为字典查找 动态路由段使用对应的转换器进行匹配
+因此匹配的耗时取决于路径的深度 而不是路由的数量
+
+为了与线性扫描保持一致的优先级(先注册的路由优先) 每个节点都记录了其子树中最早注册的路由序号
+查找时会跳过不可能产生更优结果的子树
+"""
+
+INFINITY = float('inf')
+
+
+class NoMatch:
+    """
+    路由匹配引擎的lookup返回NO_MATCH表示没有任何路由与path匹配(不论请求方法)
+    此时路由器可以直接返回404 不需要再通过match_all查找允许的请求方法
+    lookup返回None时只表示没有允许该请求方法的路由
+    """
+
+    def __repr__(self):
+        return 'NO_MATCH'
+
+
+NO_MATCH = NoMatch()
+
+
+def segment_key(parts) -> str:
+    """
+    将路由段还原为路由规则中的写法 作为子节点的键
+    """
+    return ''.join(part if isinstance(part, str) else '{%s:%s}' % (part[0], part[1].name) for part in parts)
+
+
+def build_parts_regex(parts, group_prefix: str = '') -> str:
+    """
+    将路由段构建为正则(不包含^和$)
+    :param parts: 路由段
+    :param group_prefix: 命名分组的前缀 用于避免多个路由的正则合并时出现重复的分组名
+    """
+    regex = []
+    for part in parts:
+        if isinstance(part, str):
+            regex.append(re.escape(part))
+        else:
+            variable, converter = part
+            regex.append(f"(?P<{group_prefix}{variable}>{converter.regex})")
+    return ''.join(regex)
+
+
+class DynamicSegment:
+    """
+    含有转换器的路由段 匹配成功后返回类型转换后的参数
+    """
+
+    def __init__(self, parts, regex: t.Optional[str] = None):
+        self.converters = {part[0]: part[1] for part in parts if not isinstance(part, str)}
+        # 路由段仅由一个转换器构成且该转换器提供了原生匹配方法时 不需要使用正则
+        self.native = regex is None and len(parts) == 1 and parts[0][1].match_segment is not None
+        if self.native:
+            self.variable, self.converter = parts[0]
+        self.pattern = re.compile(regex or build_parts_regex(parts))
+
+    def match(self, segment: str) -> t.Optional[dict]:
+        if self.native:
+            value = self.converter.match_segment(segment)
+            if value is None:
+                return None
+            return {self.variable: value}
+        res = self.pattern.fullmatch(segment)
+        if not res:
+            return None
+        return {
+            variable: self.converters[variable].convert_to_python(value)
+            for variable, value in res.groupdict().items()
+        }
+
+
+class TailSegments(DynamicSegment):
+    """
+    含有跨路由段转换器(例如path或者没有声明multi_segment的自定义转换器)的剩余部分 匹配请求路径中从offset开始的剩余部分
+    """
+
+    def __init__(self, segments):
+        parts = [part for remain_parts in segments for part in remain_parts]
+        # 剩余部分跨越多个路由段时只能使用正则匹配
+        regex = '/'.join(build_parts_regex(remain_parts) for remain_parts in segments) if len(segments) > 1 else None
+        super(TailSegments, self).__init__(parts, regex)
+
+    def match_tail(self, path: str, offset: int) -> t.Optional[dict]:
+        # 原生匹配时只需要对请求路径进行切片
+        return self.match(path[offset:])
+
+class RouteNode:
+    def __init__(self):
+        # 静态路由段 --> 子节点
+        self.static_children = {}
+        # 路由规则中的动态路由段 --> (DynamicSegment, 子节点)
+        self.dynamic_children = {}
+        # 从此节点开始含有跨路由段转换器的路由 [(序号, 路由, TailSegments)]
+        self.tails = []
+        # 在此节点结束的路由 相同的路由规则可以按请求方法绑定不同的路由
+        self.route = None
+        self.route_index = INFINITY
+        # 请求方法 --> (序号, 路由)
+        self.method_routes = {}
+        # 子树中最早注册的路由序号
+        self.min_index = INFINITY
+
+
+class RouteTree:
+    def __init__(self):
+        self.root = RouteNode()
+        self._count = 0
+
+    def insert(self, route):
+        """
+        将路由插入到路由树中
+        """
+        index = self._count
+        self._count += 1
+        node = self.root
+        node.min_index = min(node.min_index, index)
+        for position, parts in enumerate(route.segments):
+            # 含有跨路由段(例如path)或者无法确定是否跨路由段的转换器时 剩余部分使用正则匹配
+            if any(not isinstance(part, str) and part[1].multi_segment is not False for part in parts):
+                node.tails.append((index, route, TailSegments(route.segments[position:])))
+                return
+            key = route.segment_keys[position]
+            if all(isinstance(part, str) for part in parts):
+                child = node.static_children.get(key)
+                if child is None:
+                    child = node.static_children[key] = RouteNode()
+            else:
+                dynamic = node.dynamic_children.get(key)
+                if dynamic is None:
+                    dynamic = node.dynamic_children[key] = (DynamicSegment(parts), RouteNode())
+                child = dynamic[1]
+            node = child
+            node.min_index = min(node.min_index, index)
+        if node.route is None:
+            node.route = route
+            node.route_index = index
+        for method in route.methods:
+            node.method_routes.setdefault(method, (index, route))
+
+    def lookup(self, path: str, method: t.Optional[str] = None) -> t.Optional[t.Tuple[t.Any, dict]]:
+        """
+        查找与path匹配、允许该请求方法且最早注册的路由
+        :param path: 请求路径
+        :param method: 请求方法 为None时不检查请求方法
+        :return: (路由, 类型转换后的参数) 未找到时返回None
+        """
+        best = self._search(self.root, path, path.split('/'), method, 0, 0, {}, None)
+        if best is None:
+            return None
+        return best[1], best[2]
+
+    def match_all(self, path: str) -> list:
+        """
+        查找所有与path匹配的路由 不检查请求方法 用于获取允许的请求方法
+        :return: 按注册顺序排列的路由
+        """
+        found = []
+        self._collect(self.root, path, path.split('/'), 0, 0, found)
+        return [route for index, route in sorted(found, key=lambda item: item[0])]
+
+    def _search(self, node, path, segments, method, position, offset, arguments, best):
+        bound = best[0] if best else INFINITY
+        if node.min_index >= bound:
+            return best
+        if position == len(segments):
+            if method is None:
+                if node.route_index < bound:
+                    return node.route_index, node.route, arguments
+            else:
+                entry = node.method_routes.get(method)
+                if entry is not None and entry[0] < bound:
+                    return entry[0], entry[1], arguments
+            return best
+        for index, route, tail in node.tails:
+            if index >= bound:
+                break
+            if method is not None and method not in route.method_set:
+                continue
+            values = tail.match_tail(path, offset)
+            if values is not None:
+                best = index, route, {**arguments, **values}
+                break
+        segment = segments[position]
+        next_offset = offset + len(segment) + 1
+        child = node.static_children.get(segment)
+        if child is not None:
+            best = self._search(child, path, segments, method, position + 1, next_offset, arguments, best)
+        for dynamic, child in node.dynamic_children.values():
+            if child.min_index >= (best[0] if best else INFINITY):
+                continue
+            values = dynamic.match(segment)
+            if values is not None:
+                best = self._search(
+                    child, path, segments, method, position + 1, next_offset, {**arguments, **values}, best
+                )
+        return best
+
+    def _collect(self, node, path, segments, position, offset, found):
+        if position == len(segments):
+            found.extend(set(node.method_routes.values()))
+            return
+        for index, route, tail in node.tails:
+            if tail.match_tail(path, offset) is not None:
+                found.append((index, route))
+        segment = segments[position]
+        next_offset = offset + len(segment) + 1
+        child = node.static_children.get(segment)
+        if child is not None:
+            self._collect(child, path, segments, position + 1, next_offset, found)
+        for dynamic, child in node.dynamic_children.values():
+            if dynamic.match(segment) is not None:
+                self._collect(child, path, segments, position + 1, next_offset, found)
@@ -0,0 +1,69 @@
+# @FileName: server.py
+# @Date    : 2026/10/18-21:10
+# @Author  : vank
+# @Project : vank
+import os
+import io
+from wsgiref import simple_server
+
+"""
+Application.run使用的开发服务器
+与wsgiref.simple_server相同 只是在响应为wsgi.file_wrapper时通过os.sendfile由内核直接将文件复制到socket
+"""
+
+
+class ServerHandler(simple_server.ServerHandler):
+
+    def sendfile(self):
+        """
+        发送wsgi.file_wrapper包装的文件 从文件的当前位置开始 发送Content-Length个字节
+        文件或者socket没有文件描述符、平台不支持os.sendfile时返回False 由wsgiref按块迭代
+        """
+        if not hasattr(os, 'sendfile'):
+            return False
+        filelike = self.result.filelike
+        try:
+            in_fd = filelike.fileno()
+            out_fd = self.stdout.fileno()
+        except (AttributeError, OSError, io.UnsupportedOperation):
+            return False
+        offset = os.lseek(in_fd, 0, os.SEEK_CUR)
+        if not self.headers_sent:
+            self.send_headers()
+        self._flush()
+        content_length = self.headers.get('Content-Length')
+        count = int(content_length) if content_length else os.fstat(in_fd).st_size - offset
+        while count > 0:
+            sent = os.sendfile(out_fd, in_fd, offset, count)
+            if not sent:
+                # 文件在发送的过程中被截断
+                break
+            offset += sent
+            count -= sent
+            self.bytes_sent += sent
+        return True
+
+
+class WSGIRequestHandler(simple_server.WSGIRequestHandler):
+
+    def handle(self):
+        self.raw_requestline = self.rfile.readline(65537)
+        if len(self.raw_requestline) > 65536:
+            self.requestline = ''
+            self.request_version = ''
+            self.command = ''
+            self.send_error(414)
+            return
+        if not self.parse_request():
+            return
+        handler = ServerHandler(self.rfile, self.wfile, self.get_stderr(), self.get_environ(), multithread=False)
+        handler.request_handler = self
+        handler.run(self.server.get_app())
+
+
+def make_server(host: str, port: int, app, server_class=simple_server.WSGIServer,
+                handler_class=WSGIRequestHandler):
+    """
+    创建开发服务器
+    """
+    return simple_server.make_server(host, port, app, server_class, handler_class)
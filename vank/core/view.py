@@ -20,6 +20,18 @@ class View:
 
     """
 
+    @property
+    def method_handlers(self) -> dict:
+        """
+        请求方法 --> 类方法 在第一次使用时(通常是注册时)构建 处理请求时不需要再通过getattr查找
+        子类定义__init__时不需要调用super().__init__()
+        """
+        handlers = self.__dict__.get('_method_handlers')
+        if handlers is None:
+            handlers = {method.upper(): getattr(self, method) for method in self.get_view_methods}
+            self.__dict__['_method_handlers'] = handlers
+        return handlers
+
     @property
     def get_view_methods(self):
         http_methods = ["get", "post", "put", "patch", "delete", "head", "options", "trace"]
@@ -30,8 +42,7 @@ class View:
         return allowed_methods
 
     def get_response(self, *args, **kwargs):
-        request_method: str = request.method
-        return getattr(self, request_method.lower())(*args, **kwargs)
+        return self.method_handlers[request.method](*args, **kwargs)
 
     def __call__(self, *args, **kwargs):
         """
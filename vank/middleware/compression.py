@@ -0,0 +1,217 @@
+# @FileName: compression.py
+# @Date    : 2026/10/18-22:40
+# @Author  : vank
+# @Project : vank
+import zlib
+import typing as t
+from vank.core.config import conf
+from vank.core.context import request
+from vank.middleware.base import BaseMiddleware
+from vank.core.http.response import BaseResponse
+
+try:
+    import brotli
+except ImportError:
+    try:
+        import brotlicffi as brotli
+    except ImportError:
+        brotli = None
+
+
+class GzipCompressor:
+    def __init__(self, level: int):
+        # wbits为31时输出gzip格式
+        self.compressor = zlib.compressobj(level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        data = self.compressor.compress(data)
+        return data + self.compressor.flush(zlib.Z_SYNC_FLUSH) if flush else data
+
+    def finish(self) -> bytes:
+        return self.compressor.flush()
+
+
+class BrotliCompressor:
+    def __init__(self, quality: int):
+        self.compressor = brotli.Compressor(quality=quality)
+
+    def compress(self, data: bytes, flush: bool = True) -> bytes:
+        data = self.compressor.process(data)
+        return data + self.compressor.flush() if flush else data
+
+    def finish(self) -> bytes:
+        return self.compressor.finish()
+
+
+class ResponseCompressed(BaseResponse):
+    """
+    逐块压缩另一个响应的响应体 使用原来响应的状态码、响应头与cookie
+    每一块都会立即刷新 流式响应的客户端不需要等待压缩器的缓冲区填满
+    """
+    __slots__ = ('response', 'compressor', 'iterator')
+
+    def __init__(self, response: BaseResponse, compressor):
+        super(ResponseCompressed, self).__init__(status=response._status)  # noqa
+        self.response = response
+        self.compressor = compressor
+        # 正在迭代的生成器
+        self.iterator = None
+        self._headers = response.headers
+        self._cookies = response._cookies  # noqa
+
+    def call_on_close(self, callback: t.Callable):
+        self.response.call_on_close(callback)
+
+    def close(self):
+        # 客户端断开连接时生成器可能还没有结束 关闭它以便释放原来的响应打开的文件等资源
+        if self.iterator is not None:
+            self.iterator.close()
+        if hasattr(self.response, 'close'):
+            self.response.close()
+
+    def __iter__(self):
+        self.iterator = self.iter_compressed()
+        return self.iterator
+
+    def iter_compressed(self) -> t.Iterator[bytes]:
+        iterable = iter(self.response)
+        try:
+            for chunk in iterable:
+                if chunk:
+                    data = self.compressor.compress(chunk)
+                    if data:
+                        yield data
+            yield self.compressor.finish()
+        finally:
+            # 关闭文件响应等生成器中打开的资源
+            if hasattr(iterable, 'close'):
+                iterable.close()
+
+
+class CompressionMiddleware(BaseMiddleware):
+    """
+    根据请求头Accept-Encoding使用brotli(需要安装brotli)或gzip压缩响应体
+    普通响应一次性压缩 文件响应与流式响应逐块压缩 并且修改Content-Length、Content-Encoding与Vary
+    不压缩小于COMPRESSION_MIN_SIZE的响应、部分内容响应以及图片、视频、压缩包等本身已经压缩的内容
+    """
+    # 需要压缩的Content-Type 此外text/*以及+json、+xml结尾的类型也会被压缩
+    compressible_types = frozenset([
+        'application/json',
+        'application/javascript',
+        'application/x-javascript',
+        'application/ecmascript',
+        'application/xml',
+        'application/x-ndjson',
+        'application/wasm',
+        'application/x-www-form-urlencoded',
+        'application/vnd.ms-fontobject',
+        'font/ttf',
+        'font/otf',
+        'image/svg+xml',
+        'image/x-icon',
+        'image/bmp',
+    ])
+    # 不需要压缩的状态码
+    excluded_statuses = frozenset([204, 206, 304, 412, 416])
+
+    def __init__(self, get_response_callable):
+        super(CompressionMiddleware, self).__init__(get_response_callable)
+        self.level = conf.COMPRESSION_LEVEL
+        self.brotli_quality = conf.COMPRESSION_BROTLI_QUALITY
+        self.min_size = conf.COMPRESSION_MIN_SIZE
+        # 支持的编码 优先级相同时使用靠前的编码
+        self.encodings = ['br', 'gzip'] if brotli is not None else ['gzip']
+
+    def is_compressible_type(self, response: BaseResponse) -> bool:
+        media_type = response.headers.get('Content-Type', '').partition(';')[0].strip().lower()
+        return (
+                media_type.startswith('text/')
+                or media_type.endswith(('+json', '+xml'))
+                or media_type in self.compressible_types
+        )
+
+    def is_compressible(self, response: BaseResponse) -> bool:
+        if response._status < 200 or response._status in self.excluded_statuses:  # noqa
+            return False
+        headers = response.headers
+        if 'Content-Encoding' in headers or 'Content-Range' in headers:
+            return False
+        return self.is_compressible_type(response)
+
+    @staticmethod
+    def add_vary(response: BaseResponse):
+        headers = response.headers
+        vary = headers.get('Vary')
+        if not vary:
+            headers.update('Vary', 'Accept-Encoding')
+        elif vary.strip() != '*' and 'accept-encoding' not in [item.strip().lower() for item in vary.split(',')]:
+            headers.update('Vary', f'{vary}, Accept-Encoding')
+
+    def select_encoding(self, accept_encoding: str) -> t.Optional[str]:
+        """
+        根据Accept-Encoding选择q值最高的编码 q为0表示不接受
+        """
+        qualities = {}
+        for item in accept_encoding.split(','):
+            coding, _, params = item.partition(';')
+            coding = coding.strip().lower()
+            if not coding:
+                continue
+            quality = 1.0
+            for param in params.split(';'):
+                key, _, value = param.partition('=')
+                if key.strip().lower() == 'q':
+                    try:
+                        quality = float(value)
+                    except ValueError:
+                        quality = 0.0
+            qualities[coding] = quality
+        best, best_quality = None, 0.0
+        for encoding in self.encodings:
+            quality = qualities.get(encoding, qualities.get('*', 0.0))
+            if quality > best_quality:
+                best, best_quality = encoding, quality
+        return best
+
+    def create_compressor(self, encoding: str):
+        if encoding == 'br':
+            return BrotliCompressor(self.brotli_quality)
+        return GzipCompressor(self.level)
+
+    def handle_response(self, response):
+        if not isinstance(response, BaseResponse):
+            return response
+        # 同一个资源的完整响应会根据Accept-Encoding压缩 缓存需要根据它区分
+        # 所以即使是部分内容响应等不压缩的响应 只要Content-Type可以压缩就需要添加Vary
+        if 'Content-Encoding' not in response.headers and self.is_compressible_type(response):
+            self.add_vary(response)
+        if not self.is_compressible(response):
+            return response
+        headers = response.headers
+        content_length = headers.get('Content-Length')
+        if content_length is not None and int(content_length) < self.min_size:
+            return response
+        encoding = self.select_encoding(request.headers.get('ACCEPT_ENCODING', ''))
+        if encoding is None:
+            return response
+        compressor = self.create_compressor(encoding)
+        streaming = type(response).__iter__ is not BaseResponse.__iter__
+        if not streaming:
+            body = response.body
+            if len(body) < self.min_size:
+                return response
+            compressed = compressor.compress(body, flush=False) + compressor.finish()
+            if len(compressed) >= len(body):
+                return response
+            response.body = compressed
+        headers.update('Content-Encoding', encoding)
+        # 压缩后的内容不同 强ETag需要改为弱ETag
+        etag = headers.get('ETag')
+        if etag and not etag.startswith('W/'):
+            headers.update('ETag', f'W/{etag}')
+        if not streaming:
+            return response
+        # 逐块压缩时无法预先知道长度 范围请求也不再适用于压缩后的内容
+        headers.remove('Content-Length')
+        headers.remove('Accept-Ranges')
+        return ResponseCompressed(response, compressor)
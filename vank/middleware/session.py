@@ -1,6 +1,5 @@
 import json
 import base64
-from http.cookies import Morsel
 from vank.core.config import conf
 from vank.core.context import request
 from vank.utils.datastructures import Session
@@ -15,10 +14,7 @@ class SessionMiddleware(BaseMiddleware):
 
     def handle_request(self, *args, **kwargs):
         # 获取cookie
-        signed_session_value = request.cookies.get(conf.SESSION_COOKIE_NAME, "")
-        if isinstance(signed_session_value, Morsel):
-            signed_session_value = signed_session_value.value
-        signed_session_value = signed_session_value.encode('utf-8')
+        signed_session_value = request.cookies.get(conf.SESSION_COOKIE_NAME, "").encode('utf-8')
         # 使用signer进行unsign得到base64编码(base64编码可以提高传输可靠性) 然后将base64编码进行解码得到json序列
         # 再将序列转为python object
         try:
@@ -0,0 +1,34 @@
+# @FileName: cookies.py
+# @Date    : 2026/10/18-19:10
+# @Author  : vank
+# @Project : vank
+import re
+
+# 带引号的cookie值中的转义 \" \\ 以及八进制的\ooo
+_unescape_regex = re.compile(r'\\(?:([0-3][0-7][0-7])|(.))')
+
+
+def _unescape(match) -> str:
+    octal, char = match.groups()
+    return chr(int(octal, 8)) if octal else char
+
+
+def parse_cookie(cookie: str) -> dict:
+    """
+    解析请求头Cookie 返回 cookie名 --> 值
+    与SimpleCookie不同 遇到不合法的cookie时只会跳过这一个cookie 而不是丢弃整个请求头
+    同名的cookie只保留第一个(浏览器会将路径更具体的cookie放在前面)
+    """
+    cookies = {}
+    for chunk in cookie.split(';'):
+        name, equal, value = chunk.partition('=')
+        name = name.strip()
+        if not equal or not name or name in cookies:
+            continue
+        value = value.strip()
+        if len(value) > 1 and value[0] == value[-1] == '"':
+            value = value[1:-1]
+            if '\\' in value:
+                value = _unescape_regex.sub(_unescape, value)
+        cookies[name] = value
+    return cookies
@@ -1,34 +1,169 @@
+import io
+import os
 import copy
+import mmap
+import errno
+import shutil
 import tempfile
 import typing as t
+from threading import Lock
+from collections import OrderedDict
+
+
+class _Missing:
+    """
+    惰性属性尚未计算时的哨兵 用于与None(可能是合法的值)区分
+    """
+
+    def __repr__(self):
+        return 'missing'
+
+    def __reduce__(self):
+        return 'missing'
+
+
+missing = _Missing()
 
 
 class SpooledUploadFile:
     """
-    利用内置库tempfile的SpooledTemporaryFile;当文件超过特定大小时，将其写到磁盘
+    上传的文件 先写入内存 当文件超过max_size时，将其写到磁盘上的临时文件
+    与tempfile.SpooledTemporaryFile不同的是临时文件是有路径的 保存时可以直接重命名而不需要复制
     """
+    # 保存文件时复制使用的缓冲区大小
+    copy_buffer_size = 1024 * 1024
 
-    def __init__(self, filename, content_type, headers):
+    def __init__(self, filename, content_type, headers, max_size: int = 1024 * 1024,
+                 temp_dir: t.Optional[str] = None):
         self.filename = filename
         self.content_type = content_type
         self.headers = headers
-        self.file = tempfile.SpooledTemporaryFile(max_size=1024 * 1024)
+        self.max_size = max_size
+        self.temp_dir = temp_dir
+        self.file = io.BytesIO()
+        # 磁盘上的临时文件的路径 文件在内存中或者已经被保存时为None
+        self.path = None
+        self._rolled = False
+        self._mmap = None
+
+    @property
+    def rolled(self) -> bool:
+        """
+        文件是否已经写到磁盘上
+        """
+        return self._rolled
+
+    def rollover(self):
+        """
+        将内存中的文件写到磁盘上的临时文件
+        """
+        if self._rolled:
+            return
+        fd, path = tempfile.mkstemp(prefix='vank-upload-', dir=self.temp_dir)
+        file = os.fdopen(fd, 'w+b')
+        file.write(self.file.getbuffer())
+        file.seek(self.file.tell())
+        self.file.close()
+        self.file = file
+        self.path = path
+        self._rolled = True
 
     def write(self, data: bytes):
+        if not self._rolled and self.file.tell() + len(data) > self.max_size:
+            self.rollover()
         self.file.write(data)
 
     def read(self, size: int = -1) -> bytes:
         return self.file.read(size)
 
-    def seek(self, offset):
-        self.file.seek(offset)
-
-    def close(self):
-        self.file.close()
+    def seek(self, offset, whence: int = os.SEEK_SET):
+        self.file.seek(offset, whence)
 
     def tell(self):
         return self.file.tell()
 
+    def fileno(self) -> int:
+        self.rollover()
+        self.file.flush()
+        return self.file.fileno()
+
+    @property
+    def size(self) -> int:
+        if self._rolled:
+            self.file.flush()
+            return os.fstat(self.file.fileno()).st_size
+        return self.file.getbuffer().nbytes
+
+    def getbuffer(self) -> memoryview:
+        """
+        获取文件内容的memoryview 不会复制文件内容
+        文件在内存中时为BytesIO的缓冲区 在磁盘上时为只读的mmap
+        在memoryview释放之前不能再写入或者关闭文件
+        """
+        if not self._rolled:
+            return self.file.getbuffer()
+        if self._mmap is None:
+            self.file.flush()
+            if not self.size:
+                return memoryview(b'')
+            self._mmap = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        return memoryview(self._mmap)
+
+    def save_to(self, path: str, permissions: t.Optional[int] = 0o644):
+        """
+        将文件保存到path
+        文件在磁盘上且与path位于同一文件系统时直接重命名 否则使用os.sendfile或者较大的缓冲区复制
+        :param path: 保存的路径
+        :param permissions: 重命名后文件的权限 临时文件的权限为0o600 为None时不修改
+        """
+        if self._rolled and self.path is not None:
+            self.file.flush()
+            try:
+                os.replace(self.path, path)
+            except OSError as e:
+                # 不在同一文件系统时无法重命名
+                if e.errno != errno.EXDEV:
+                    raise
+            else:
+                self.path = None
+                if permissions is not None:
+                    os.chmod(path, permissions)
+                return
+        with open(path, 'wb') as destination:
+            if not self._rolled:
+                destination.write(self.file.getbuffer())
+                return
+            self._copy_file(destination)
+
+    def _copy_file(self, destination):
+        position = self.file.tell()
+        size = self.size
+        try:
+            if hasattr(os, 'sendfile'):
+                offset = 0
+                while offset < size:
+                    sent = os.sendfile(destination.fileno(), self.file.fileno(), offset, size - offset)
+                    if not sent:
+                        break
+                    offset += sent
+            else:
+                self.file.seek(0)
+                shutil.copyfileobj(self.file, destination, self.copy_buffer_size)
+        finally:
+            self.file.seek(position)
+
+    def close(self):
+        if self._mmap is not None:
+            self._mmap.close()
+            self._mmap = None
+        self.file.close()
+        if self.path is not None:
+            try:
+                os.unlink(self.path)
+            except FileNotFoundError:
+                pass
+            self.path = None
+
     def __str__(self):
         return f'<{self.__class__.__name__}>:{self.filename}'
 
@@ -36,6 +171,70 @@ class SpooledUploadFile:
         return f'<{self.__class__.__name__}>:{self.filename}'
 
 
+class LRUCache:
+    """
+    有容量上限的LRU缓存 并统计命中与未命中的次数
+    当admission为True时 一个key需要被写入两次才会真正进入缓存
+    这样大量只出现一次的key(例如扫描器请求的随机URL)不会把常用的缓存挤出去
+    """
+
+    def __init__(self, max_size: int, admission: bool = False):
+        self.max_size = max_size
+        self.admission = admission
+        self.hits = 0
+        self.misses = 0
+        self.lock = Lock()
+        self._data = OrderedDict()
+        # 只出现过一次的key
+        self._candidates = OrderedDict()
+
+    def get(self, key, default: t.Optional[t.Any] = None):
+        with self.lock:
+            try:
+                value = self._data[key]
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        with self.lock:
+            if key in self._data:
+                self._data[key] = value
+                self._data.move_to_end(key)
+                return
+            if self.admission and self._candidates.pop(key, None) is None:
+                self._candidates[key] = True
+                if len(self._candidates) > self.max_size:
+                    self._candidates.popitem(last=False)
+                return
+            self._data[key] = value
+            if len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self._data.clear()
+            self._candidates.clear()
+
+    def info(self) -> dict:
+        return dict(hits=self.hits, misses=self.misses, max_size=self.max_size, size=len(self._data))
+
+    def __len__(self):
+        return len(self._data)
+
+    def __contains__(self, key):
+        return key in self._data
+
+    def __str__(self):
+        return f'<{self.__class__.__name__}>:{self.info()}'
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}>:{self.info()}'
+
+
 class MultiValueDict(dict):
 
     def get(self, key, default: t.Optional = None):
@@ -77,7 +276,7 @@ class MultiValueDict(dict):
 
     def append_value(self, key, value, error=True):
         try:
-            val = self[key]
+            val = super().__getitem__(key)
         except KeyError:
             if error:
                 raise
@@ -105,7 +304,10 @@ class Form(MultiValueDict):
     """
 
     def close(self):
-        [item.close() for item in self.values() if isinstance(item, SpooledUploadFile)]
+        for key in self:
+            for item in self.get_all(key):
+                if isinstance(item, SpooledUploadFile):
+                    item.close()
 
 
 class QueryString(MultiValueDict):
@@ -114,59 +316,97 @@ class QueryString(MultiValueDict):
 
 
 class Headers:
+    """
+    HTTP头 保持添加的顺序并且允许一个key对应多个值
+    key不区分大小写 查找时使用小写key --> 第一个值的索引 索引在第一次查找时构建
+    """
+    __slots__ = ('_list', '_index')
+
     def __init__(self, raw_headers=None):
         self._list = []
+        # 小写key --> 第一个值 为None时表示索引尚未构建或者已经失效
+        self._index = None
         if raw_headers:
-            self._list = [(key.encode('latin-1'), value.encode('latin-1')) for key, value in raw_headers]
+            if hasattr(raw_headers, 'items'):
+                raw_headers = raw_headers.items()
+            self._list = [(key, value) for key, value in raw_headers]
+
+    def _get_index(self) -> dict:
+        if self._index is None:
+            index = {}
+            for key, value in self._list:
+                index.setdefault(key.lower(), value)
+            self._index = index
+        return self._index
 
     def __iter__(self):
         return iter(self._list)
 
+    def __len__(self):
+        return len(self._list)
+
     def __getitem__(self, item: str):
-        res = [value.decode('latin-1') for key, value in self._list if key.decode('latin-1').lower() == item.lower()]
-        if res:
-            return res[0]
-        raise KeyError(item)
+        try:
+            return self._get_index()[item.lower()]
+        except KeyError:
+            raise KeyError(item)
 
     def items(self):
-        return [(key.decode('latin-1'), value.decode('latin-1')) for key, value in self._list]
+        return list(self._list)
 
     def keys(self):
-        return [key.decode('latin-1') for key, value in self._list]
+        return [key for key, value in self._list]
 
     def values(self):
-        return [value.decode('latin-1') for key, value in self._list]
+        return [value for key, value in self._list]
 
     def get(self, key, default=None):
-        for item_key, value in self._list:
-            if item_key.decode('latin-1').lower() == key.lower():
-                return value.decode('latin-1')
-        return default
+        return self._get_index().get(key.lower(), default)
+
+    def get_all(self, key) -> list:
+        """
+        获取key对应的所有值
+        """
+        key = key.lower()
+        return [value for item_key, value in self._list if item_key.lower() == key]
 
     def add(self, key, value):
-        self._list.append((key.encode('latin-1'), value.encode('latin-1')))
+        self._list.append((key, value))
+        if self._index is not None:
+            self._index.setdefault(key.lower(), value)
 
     def setdefault(self, key, value):
         # not in self 会调用__contains__魔术方法
         if key not in self:
-            self._list.append((key.encode('latin-1'), value.encode('latin-1')))
+            self.add(key, value)
 
     def update(self, key, value):
-        for index, item in enumerate(self._list):
-            if item[0].decode('latin-1').lower() == key.lower():
-                self._list[index] = (key.encode('latin-1'), value.encode('latin-1'))
-        else:
-            self.setdefault(key, value)
+        """
+        将key设置为value 替换第一个值的位置并移除其余的值 如果key不存在那么添加
+        """
+        lower_key = key.lower()
+        headers = []
+        replaced = False
+        for item_key, item_value in self._list:
+            if item_key.lower() != lower_key:
+                headers.append((item_key, item_value))
+            elif not replaced:
+                headers.append((key, value))
+                replaced = True
+        if not replaced:
+            headers.append((key, value))
+        self._list = headers
+        if self._index is not None:
+            self._index[lower_key] = value
 
     def remove(self, key):
-        # 使用[:]可以创建一个新的对象
-        for idx, item in enumerate(self._list[:]):
-            if item[0].decode('latin-1').lower() == key.lower():
-                self._list.pop(idx)
+        lower_key = key.lower()
+        self._list = [(item_key, value) for item_key, value in self._list if item_key.lower() != lower_key]
+        if self._index is not None:
+            self._index.pop(lower_key, None)
 
     def __contains__(self, key):
-        res = [item_key for item_key, value in self.items() if item_key.lower() == key.lower()]
-        return any(res)
+        return key.lower() in self._get_index()
 
     def __str__(self):
         return f'<{self.__class__.__name__}>:{self.items()}'
@@ -0,0 +1,107 @@
+# @FileName: json_backend.py
+# @Date    : 2026/10/18-18:05
+# @Author  : vank
+# @Project : vank
+import json
+import typing as t
+from functools import lru_cache
+from vank.utils.load_module import import_from_str
+
+"""
+request.json与ResponseJson使用的JSON编解码器
+JSON_BACKEND可以是:
+    - 'auto' 按AUTO_DETECT_ORDER使用第一个已经安装的库 都没有安装时使用标准库json
+    - 内置编解码器的名称 例如'orjson'
+    - 提供loads和dumps的对象(例如模块)的导入路径 例如'simplejson'
+    - (loads, dumps) 可以是函数 也可以是函数的导入路径
+"""
+
+# JSON_BACKEND为auto时按顺序检测已经安装的库
+AUTO_DETECT_ORDER = ['orjson', 'ujson', 'rapidjson']
+
+
+class JsonBackend:
+    def __init__(self, name: str, loads: t.Callable, dumps: t.Callable):
+        """
+        :param name: 名称
+        :param loads: 将str或bytes解码为python对象
+        :param dumps: 将python对象编码为str或bytes 返回bytes时响应不需要再次编码
+        """
+        self.name = name
+        self.loads = loads
+        self.dumps = dumps
+
+    def __str__(self):
+        return f'<{self.__class__.__name__}>:{self.name}'
+
+    def __repr__(self):
+        return f'<{self.__class__.__name__}>:{self.name}'
+
+
+def _stdlib_backend():
+    return JsonBackend(
+        'json',
+        json.loads,
+        # 获得最紧凑的json
+        lambda obj: json.dumps(obj, allow_nan=False, indent=None, separators=(",", ":")),
+    )
+
+
+def _orjson_backend():
+    import orjson
+    # orjson直接返回bytes 与标准库一样允许int等非str类型的key
+    return JsonBackend('orjson', orjson.loads, lambda obj: orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS))
+
+
+def _ujson_backend():
+    import ujson
+    return JsonBackend(
+        'ujson',
+        ujson.loads,
+        lambda obj: ujson.dumps(obj, ensure_ascii=True, escape_forward_slashes=False),
+    )
+
+
+def _rapidjson_backend():
+    import rapidjson
+    return JsonBackend('rapidjson', rapidjson.loads, rapidjson.dumps)
+
+
+# 内置的编解码器
+JSON_BACKENDS = {
+    'json': _stdlib_backend,
+    'orjson': _orjson_backend,
+    'ujson': _ujson_backend,
+    'rapidjson': _rapidjson_backend,
+}
+
+
+def load_json_backend(backend: t.Union[str, t.Sequence]) -> JsonBackend:
+    """
+    根据JSON_BACKEND的值创建编解码器
+    """
+    if isinstance(backend, (list, tuple)):
+        loads, dumps = (import_from_str(item) if isinstance(item, str) else item for item in backend)
+        return JsonBackend(getattr(loads, '__module__', None) or 'custom', loads, dumps)
+    if backend == 'auto':
+        for name in AUTO_DETECT_ORDER:
+            try:
+                return JSON_BACKENDS[name]()
+            except ImportError:
+                continue
+        return _stdlib_backend()
+    if backend in JSON_BACKENDS:
+        return JSON_BACKENDS[backend]()
+    codec = import_from_str(backend)
+    if not (callable(getattr(codec, 'loads', None)) and callable(getattr(codec, 'dumps', None))):
+        raise ValueError(f'The JSON backend "{backend}" should provide "loads" and "dumps"')
+    return JsonBackend(backend, codec.loads, codec.dumps)
+
+
+@lru_cache(maxsize=None)
+def get_json_backend() -> JsonBackend:
+    """
+    获取配置JSON_BACKEND所对应的编解码器
+    """
+    from vank.core.config import conf
+    return load_json_backend(conf.JSON_BACKEND)
@@ -1,5 +1,8 @@
+import re
+import json
+import codecs
 import typing as t
-from urllib.parse import parse_qsl
+from urllib.parse import parse_qsl, unquote
 from vank.utils.datastructures import Form, SpooledUploadFile
 
 
@@ -9,47 +12,262 @@ class ParseException(Exception):
     """
 
 
+class ParseSizeException(ParseException):
+    """
+    解析时超过了大小限制
+    """
+
+
+# 请求头的参数 带引号的值中允许出现';'和'='
+options_header_regex = re.compile(rb';\s*([^\s;=]+)\s*=\s*("(?:[^"\\]|\\.)*"|[^;]*)')
+
+
+def parse_options_header(value: bytes) -> t.Tuple[bytes, t.Dict[bytes, bytes]]:
+    """
+    解析带参数的请求头 例如 form-data; name="field"; filename="a;b=c.txt"
+    :return: (主值, {小写的参数名: 参数值})
+    """
+    main_value, _, rest = value.partition(b';')
+    options = {}
+    for key, option_value in options_header_regex.findall(b';' + rest):
+        option_value = option_value.strip()
+        if len(option_value) > 1 and option_value[:1] == option_value[-1:] == b'"':
+            option_value = option_value[1:-1].replace(b'\\\\', b'\\').replace(b'\\"', b'"')
+        options[key.lower()] = option_value
+    return main_value.strip(), options
+
+
+def parse_range_header(value: str, size: int) -> t.Optional[t.List[t.Tuple[int, int]]]:
+    """
+    解析请求头Range 例如 bytes=0-499, 1000-, -500
+    :param size: 文件的字节数
+    :return: [(start, stop)] stop不包含在范围内 没有可以满足的范围时返回空列表
+             请求头不合法或者单位不是bytes时返回None 此时应该忽略Range
+    """
+    unit, equal, byte_ranges = value.partition('=')
+    if not equal or unit.strip().lower() != 'bytes':
+        return None
+    ranges = []
+    for byte_range in byte_ranges.split(','):
+        byte_range = byte_range.strip()
+        if not byte_range:
+            continue
+        first, dash, last = byte_range.partition('-')
+        first, last = first.strip(), last.strip()
+        if not dash or (first and not first.isdigit()) or (last and not last.isdigit()) or not (first or last):
+            return None
+        if not first:
+            # 后缀范围 最后的n个字节
+            length = int(last)
+            if length:
+                ranges.append((max(size - length, 0), size))
+            continue
+        start = int(first)
+        if last and int(last) < start:
+            return None
+        if start < size:
+            ranges.append((start, min(int(last) + 1, size) if last else size))
+    return ranges
+
+
 class MultiPartFormParser:
     """
     multipart-form/data解析器
     规范：
     https://datatracker.ietf.org/doc/html/rfc7578#section-4.1
+
+    以状态机的方式逐块解析请求体 文件部分的数据到达时直接写入SpooledUploadFile
+    因此内存占用只取决于块的大小与SpooledUploadFile的阈值
     """
+    # 解析状态
+    PREAMBLE = 0  # 第一个分隔符之前
+    DELIMITER = 1  # 分隔符之后 等待'--'(结束)或者换行
+    HEADERS = 2  # 部分的头部
+    BODY = 3  # 部分的内容
+    END = 4  # 结束分隔符之后
+    # 每个部分头部的最大字节数
+    max_header_size = 16 * 1024
 
-    def __init__(self, content_parameter, body, charset: t.Optional[str] = 'utf-8'):
-        self.boundary = content_parameter[b'boundary']
+    def __init__(self, content_parameter, body, charset: t.Optional[str] = 'utf-8',
+                 max_part_size: int = 0, max_size: int = 0, spool_size: int = 1024 * 1024,
+                 temp_dir: t.Optional[str] = None):
+        """
+        :param content_parameter: Content-Type的参数
+        :param body: 请求体 bytes或者产生bytes的可迭代对象(例如request.body)
+        :param charset: 字段名、文件名以及普通字段的编码
+        :param max_part_size: 每个部分内容的最大字节数 0为不限制
+        :param max_size: 所有部分内容的最大字节数 0为不限制
+        :param spool_size: 上传的文件超过该大小时写到磁盘
+        :param temp_dir: 上传文件的临时目录 为None时使用系统的临时目录
+        """
+        boundary = content_parameter.get('boundary')
+        if not boundary:
+            raise ParseException('The boundary of multipart/form-data must be provided')
+        self.boundary = boundary.encode('latin-1')
         self.body = body
         self.charset = charset
+        self.max_part_size = max_part_size
+        self.max_size = max_size
+        self.spool_size = spool_size
+        self.temp_dir = temp_dir
+        # 第一个分隔符可以位于请求体的开头 之后的分隔符前面都有换行
+        self.delimiter = b'--' + self.boundary
+        self.separator = b'\r\n' + self.delimiter
+        self.state = self.PREAMBLE
+        self.buffer = bytearray()
+        self.form = Form()
+        # 当前部分的字段名、值(普通字段为bytearray 文件为SpooledUploadFile)以及大小
+        self.field_name = None
+        self.field_value = None
+        self.part_size = 0
+        self.total_size = 0
 
     def run(self):
-        form = Form()
-        parts = self.body.split(b"--" + self.boundary)
-        parts = parts[1:-1]
-        for part in parts:
-            header, content = part.split(b'\r\n\r\n', 1)
-            content = content.strip(b'\r\n')
-            headers = dict([line.split(b': ', 1) for line in header.split(b'\r\n')[1:]])
-            ctype, rest = headers.get(b'Content-Disposition').split(b'; ', 1)
-            mapped_content_disposition = dict(line.split(b'=') for line in rest.split(b'; '))
-            mapped_content_disposition = dict(
-                (key, value.strip(b'"')) for key, value in mapped_content_disposition.items())
-            try:
-                field_name = mapped_content_disposition[b"name"]
-            except KeyError:
-                raise ParseException('The Content Disposition header field "name" must be provided')
-            else:
-                field_name = field_name.decode(self.charset)
-            # 如果filename在content_dispositions中,那么该部分为文件
-            if b"filename" in mapped_content_disposition.keys():
-                filename = mapped_content_disposition[b'filename'].decode(self.charset)
-                content_type = headers.get(b'Content-Type', b"").decode(self.charset)
-                field_value = SpooledUploadFile(filename, content_type, mapped_content_disposition)
-                field_value.write(content)
-                field_value.seek(0)
-            else:
-                field_value = content.decode(self.charset)
-            form.append_value(field_name, field_value, error=False)
-        return form
+        chunks = [self.body] if isinstance(self.body, (bytes, bytearray)) else self.body
+        try:
+            for chunk in chunks:
+                self.feed(chunk)
+            if self.state != self.END:
+                raise ParseException('Unexpected end of the multipart/form-data body')
+        except Exception:
+            if isinstance(self.field_value, SpooledUploadFile):
+                self.field_value.close()
+            self.form.close()
+            raise
+        return self.form
+
+    def feed(self, chunk: bytes):
+        """
+        解析一块数据 不完整的数据会保留在缓冲区中等待下一块数据
+        """
+        buffer = self.buffer
+        buffer += chunk
+        handlers = {
+            self.PREAMBLE: self._parse_preamble,
+            self.DELIMITER: self._parse_delimiter,
+            self.HEADERS: self._parse_headers,
+            self.BODY: self._parse_body,
+        }
+        while buffer and self.state != self.END:
+            if not handlers[self.state](buffer):
+                break
+        if self.state == self.END:
+            # 结束分隔符之后的内容直接忽略
+            buffer.clear()
+
+    def _parse_preamble(self, buffer: bytearray) -> bool:
+        index = buffer.find(self.delimiter)
+        if index < 0:
+            # 保留可能是分隔符开头的部分
+            del buffer[:max(0, len(buffer) - len(self.delimiter) + 1)]
+            return False
+        del buffer[:index + len(self.delimiter)]
+        self.state = self.DELIMITER
+        return True
+
+    def _parse_delimiter(self, buffer: bytearray) -> bool:
+        if len(buffer) < 2:
+            return False
+        if buffer[:2] == b'--':
+            self.state = self.END
+            return True
+        # 分隔符之后的空白直到换行都应该忽略
+        index = buffer.find(b'\r\n')
+        if index < 0:
+            if len(buffer) > self.max_header_size:
+                raise ParseException('Invalid multipart/form-data delimiter')
+            return False
+        del buffer[:index + 2]
+        self.state = self.HEADERS
+        return True
+
+    def _parse_headers(self, buffer: bytearray) -> bool:
+        if buffer[:2] == b'\r\n':
+            index = 0
+        else:
+            index = buffer.find(b'\r\n\r\n')
+            if index < 0:
+                if len(buffer) > self.max_header_size:
+                    raise ParseException('The headers of multipart/form-data part are too large')
+                return False
+            index += 2
+        headers = {}
+        for line in bytes(buffer[:index]).split(b'\r\n'):
+            if not line:
+                continue
+            name, colon, value = line.partition(b':')
+            if not colon:
+                raise ParseException(f'Invalid multipart/form-data header {line!r}')
+            headers[name.strip().decode('latin-1').title()] = value.strip()
+        del buffer[:index + 2]
+        self._start_part(headers)
+        self.state = self.BODY
+        return True
+
+    def _start_part(self, headers: dict):
+        content_disposition = headers.get('Content-Disposition')
+        if content_disposition is None:
+            raise ParseException('The Content-Disposition header must be provided')
+        _, options = parse_options_header(content_disposition)
+        try:
+            self.field_name = options[b'name'].decode(self.charset)
+        except KeyError:
+            raise ParseException('The Content Disposition header field "name" must be provided')
+        self.part_size = 0
+        # 如果filename在Content-Disposition中,那么该部分为文件
+        if b'filename*' in options:
+            # RFC 5987 charset'language'value
+            charset, _, value = options[b'filename*'].decode('latin-1').partition("'")
+            value = value.partition("'")[2]
+            filename = unquote(value, charset or self.charset)
+        elif b'filename' in options:
+            filename = options[b'filename'].decode(self.charset)
+        else:
+            self.field_value = bytearray()
+            return
+        content_type = headers.get('Content-Type', b'').decode(self.charset)
+        headers = {name: value.decode(self.charset, 'replace') for name, value in headers.items()}
+        self.field_value = SpooledUploadFile(filename, content_type, headers, self.spool_size, self.temp_dir)
+
+    def _parse_body(self, buffer: bytearray) -> bool:
+        index = buffer.find(self.separator)
+        if index < 0:
+            # 保留可能是分隔符开头的部分 其余的数据属于当前部分
+            end = len(buffer) - len(self.separator) + 1
+            if end > 0:
+                self._write(buffer[:end])
+                del buffer[:end]
+            return False
+        self._write(buffer[:index])
+        del buffer[:index + len(self.separator)]
+        self._finish_part()
+        self.state = self.DELIMITER
+        return True
+
+    def _write(self, data: bytearray):
+        if not data:
+            return
+        self.part_size += len(data)
+        self.total_size += len(data)
+        if self.max_part_size and self.part_size > self.max_part_size:
+            raise ParseSizeException(
+                f'The multipart/form-data part "{self.field_name}" exceeds the limit of {self.max_part_size} bytes')
+        if self.max_size and self.total_size > self.max_size:
+            raise ParseSizeException(
+                f'The multipart/form-data body exceeds the limit of {self.max_size} bytes')
+        if isinstance(self.field_value, SpooledUploadFile):
+            self.field_value.write(data)
+        else:
+            self.field_value += data
+
+    def _finish_part(self):
+        field_value = self.field_value
+        if isinstance(field_value, SpooledUploadFile):
+            field_value.seek(0)
+        else:
+            field_value = field_value.decode(self.charset)
+        self.form.append_value(self.field_name, field_value, error=False)
+        self.field_name = self.field_value = None
 
 
 class FormParser:
@@ -61,3 +279,206 @@ class FormParser:
         for key, value in parse_qsl(self.stream.decode("latin1"), keep_blank_values=False):
             form.append_value(key, value, error=False)
         return form
+
+
+class NDJsonParser:
+    """
+    逐行解码NDJSON(每行一个JSON) 每读取一块数据就产出其中完整的记录
+    """
+
+    def __init__(self, body, loads: t.Callable = json.loads):
+        """
+        :param body: 请求体 bytes或者产生bytes的可迭代对象(例如request.body)
+        :param loads: JSON解码函数
+        """
+        self.body = body
+        self.loads = loads
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        chunks = [self.body] if isinstance(self.body, (bytes, bytearray)) else self.body
+        buffer = bytearray()
+        line_number = 0
+        for chunk in chunks:
+            buffer += chunk
+            start = 0
+            end = buffer.find(b'\n')
+            while end >= 0:
+                line_number += 1
+                yield from self._decode(buffer[start:end], line_number)
+                start = end + 1
+                end = buffer.find(b'\n', start)
+            del buffer[:start]
+        yield from self._decode(buffer, line_number + 1)
+
+    def _decode(self, line: bytearray, line_number: int):
+        line = line.strip()
+        if not line:
+            return
+        try:
+            yield self.loads(bytes(line))
+        except ValueError as e:
+            raise ParseException(f'Invalid JSON at line {line_number}: {e}')
+
+
+class JsonArrayParser:
+    """
+    逐个解码顶层JSON数组中的元素 每读取一块数据就产出其中完整的元素
+    元素是否完整由增量扫描括号的嵌套层数与字符串状态判断 元素结束之后才使用标准库json的raw_decode解码
+    这样很大的元素分成多块到达时 每块只需要扫描新的数据 而不是从元素的开头重新解码
+    """
+    whitespace = ' \t\n\r'
+    # 字符串中需要处理的字符
+    string_special = re.compile(r'["\\]')
+    # 字符串之外需要处理的字符
+    structural = re.compile(r'[\[\]{}"]')
+    # 数字、true、false、null之后的分隔符
+    delimiter = re.compile(r'[ \t\n\r,\]]')
+
+    def __init__(self, body, charset: t.Optional[str] = 'utf-8'):
+        """
+        :param body: 请求体 bytes或者产生bytes的可迭代对象(例如request.body)
+        :param charset: 请求体的编码
+        """
+        self.body = body
+        self.charset = charset
+        self.decoder = json.JSONDecoder()
+        # 上一个元素之后是否为',' 此时不能直接出现']'
+        self.after_comma = False
+        # 当前元素的扫描状态: 已经扫描的字符数、括号的嵌套层数、是否在字符串中
+        self.scanned = 0
+        self.depth = 0
+        self.in_string = False
+        # 已经解码但之后还没有出现','或者']'的元素 (元素, 元素的长度)
+        self.pending = None
+
+    def __iter__(self) -> t.Iterator[t.Any]:
+        chunks = [self.body] if isinstance(self.body, (bytes, bytearray)) else self.body
+        text_decoder = codecs.getincrementaldecoder(self.charset)()
+        buffer = ''
+        # 数组的'['是否已经出现 数组的']'是否已经出现
+        started = finished = False
+        for chunk in chunks:
+            buffer += text_decoder.decode(chunk)
+            if not started:
+                buffer = buffer.lstrip(self.whitespace)
+                if not buffer:
+                    continue
+                if buffer[0] != '[':
+                    raise ParseException('The JSON body should be an array')
+                buffer = buffer[1:]
+                started = True
+            if not finished:
+                buffer, finished = yield from self._decode(buffer, False)
+        buffer += text_decoder.decode(b'', True)
+        if not started:
+            raise ParseException('The JSON body should be an array')
+        if not finished:
+            buffer, finished = yield from self._decode(buffer, True)
+            if not finished:
+                raise ParseException('Unexpected end of the JSON array')
+        if buffer.strip(self.whitespace):
+            raise ParseException('Extra data after the JSON array')
+
+    def _scan(self, buffer: str, start: int) -> t.Optional[int]:
+        """
+        从上次停止的位置继续扫描从start开始的元素
+        :return: 元素结束的位置 元素还不完整时返回None
+        """
+        length = len(buffer)
+        index = start + self.scanned
+        if buffer[start] not in '{["':
+            # 数字等元素在出现分隔符之后才是完整的 例如'-1500.0'可能只读取到了'-1500.'
+            res = self.delimiter.search(buffer, index)
+            if res is None:
+                self.scanned = length - start
+                return None
+            return res.start()
+        while index < length:
+            if self.in_string:
+                res = self.string_special.search(buffer, index)
+                if res is None:
+                    index = length
+                    break
+                if res.group() == '\\':
+                    # 跳过被转义的字符 它可能在下一块数据中
+                    index = res.end() + 1
+                    continue
+                self.in_string = False
+                index = res.end()
+                if self.depth == 0:
+                    return index
+                continue
+            quote = buffer.find('"', index)
+            stop = length if quote < 0 else quote
+            closes = buffer.count(']', index, stop) + buffer.count('}', index, stop)
+            if closes < self.depth:
+                # 到下一个字符串之前嵌套层数不可能回到0 只需要计数
+                self.depth += buffer.count('[', index, stop) + buffer.count('{', index, stop) - closes
+                if quote < 0:
+                    index = length
+                    break
+                self.in_string = True
+                index = quote + 1
+                continue
+            res = self.structural.search(buffer, index)
+            if res is None:
+                index = length
+                break
+            index = res.end()
+            char = res.group()
+            if char == '"':
+                self.in_string = True
+            elif char in '[{':
+                self.depth += 1
+            else:
+                self.depth -= 1
+                if self.depth <= 0:
+                    return index
+        self.scanned = index - start
+        return None
+
+    def _decode(self, buffer: str, final: bool):
+        """
+        解码buffer中完整的元素 元素之后必须已经出现','或者']'
+        :return: (剩余的buffer, 数组是否已经结束)
+        """
+        position = 0
+        length = len(buffer)
+        while True:
+            while position < length and buffer[position] in self.whitespace:
+                position += 1
+            if position == length:
+                return '', False
+            if self.pending is None:
+                if buffer[position] == ']':
+                    if self.after_comma:
+                        raise ParseException('Unexpected "]" after "," in the JSON array')
+                    return buffer[position + 1:], True
+                if self._scan(buffer, position) is None and not final:
+                    return buffer[position:], False
+                self.scanned = self.depth = 0
+                self.in_string = False
+                try:
+                    value, end = self.decoder.raw_decode(buffer, position)
+                except ValueError as e:
+                    raise ParseException(f'Invalid JSON array: {e}')
+                self.pending = value, end - position
+            value, end = self.pending
+            end += position
+            separator = end
+            while separator < length and buffer[separator] in self.whitespace:
+                separator += 1
+            if separator == length:
+                if final:
+                    raise ParseException('Unexpected end of the JSON array')
+                return buffer[position:], False
+            self.pending = None
+            if buffer[separator] == ',':
+                position = separator + 1
+                self.after_comma = True
+            elif buffer[separator] == ']':
+                position = separator
+                self.after_comma = False
+            else:
+                raise ParseException(f'Expecting "," or "]" at position {separator} of the JSON array')
+            yield value
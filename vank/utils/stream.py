@@ -0,0 +1,230 @@
+# @FileName: stream.py
+# @Date    : 2026/10/18-17:20
+# @Author  : vank
+# @Project : vank
+import io
+import zlib
+import typing as t
+from vank.utils.parsers import ParseException, ParseSizeException
+
+
+class LimitedStream(io.RawIOBase):
+    """
+    包装wsgi.input 最多只读取limit个字节
+    WSGI服务器的wsgi.input在读取超过Content-Length时可能会阻塞 所以需要限制读取的长度
+    """
+
+    def __init__(self, stream, limit: int, chunk_size: int = 65536):
+        self.stream = stream
+        self.limit = limit
+        self.chunk_size = chunk_size
+        # 已经读取的字节数
+        self.position = 0
+
+    @property
+    def remaining(self) -> int:
+        return self.limit - self.position
+
+    @property
+    def consumed(self) -> bool:
+        """
+        是否已经开始读取 请求体只能被读取一次
+        """
+        return self.position > 0
+
+    def readable(self):
+        return True
+
+    def read(self, size: t.Optional[int] = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0:
+            return b''
+        data = self.stream.read(size)
+        self.position += len(data)
+        if len(data) < size:
+            # 客户端提前断开连接 之后的读取都返回空
+            self.limit = self.position
+        return data
+
+    def readall(self) -> bytes:
+        chunks = []
+        for chunk in self:
+            chunks.append(chunk)
+        return b''.join(chunks)
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def readline(self, size: t.Optional[int] = -1) -> bytes:
+        if size is None or size < 0 or size > self.remaining:
+            size = self.remaining
+        if size <= 0 or not hasattr(self.stream, 'readline'):
+            return super(LimitedStream, self).readline(size)
+        line = self.stream.readline(size)
+        self.position += len(line)
+        return line
+
+    def iter_chunks(self, chunk_size: t.Optional[int] = None) -> t.Iterator[bytes]:
+        """
+        按chunk_size逐块读取剩余的请求体
+        """
+        chunk_size = chunk_size or self.chunk_size
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def __next__(self):
+        chunk = self.read(self.chunk_size)
+        if not chunk:
+            raise StopIteration
+        return chunk
+
+
+class FileRange(LimitedStream):
+    """
+    打开的文件中从当前位置开始的limit个字节
+    保留文件描述符 WSGI服务器可以使用sendfile从文件描述符的当前位置发送
+    """
+
+    def fileno(self) -> int:
+        return self.stream.fileno()
+
+    def close(self):
+        self.stream.close()
+        super(FileRange, self).close()
+
+
+class DecompressedStream(io.RawIOBase):
+    """
+    逐块解压Content-Encoding为gzip或deflate的请求体 gzip可以由多个成员首尾相接组成
+    解压后的大小超过max_size时抛出ParseSizeException 防止很小的请求体解压后占用大量内存(zip炸弹)
+    """
+    # Content-Encoding --> zlib的wbits
+    encodings = {
+        'gzip': 16 + zlib.MAX_WBITS,
+        'x-gzip': 16 + zlib.MAX_WBITS,
+        'deflate': zlib.MAX_WBITS,
+    }
+
+    def __init__(self, stream, encoding: str, max_size: int = 0, chunk_size: int = 65536):
+        """
+        :param stream: 压缩的请求体 例如LimitedStream
+        :param encoding: Content-Encoding
+        :param max_size: 解压后的最大字节数 0为不限制
+        :param chunk_size: 每次从stream读取以及解压的字节数
+        """
+        self.stream = stream
+        self.encoding = encoding
+        self.max_size = max_size
+        self.chunk_size = chunk_size
+        # deflate需要根据前两个字节判断是否有zlib头部 所以在读取到数据之后才创建
+        self.decompressor = None
+        # 已经解压但还没有被读取的数据
+        self.buffer = bytearray()
+        # 已经解压的字节数
+        self.position = 0
+        self.eof = False
+
+    @property
+    def consumed(self) -> bool:
+        return self.stream.consumed
+
+    def readable(self):
+        return True
+
+    def _create_decompressor(self, data: bytes):
+        wbits = self.encodings[self.encoding]
+        # 有些客户端发送的deflate没有zlib头部(raw deflate)
+        # zlib头部的压缩方法为8 且前两个字节组成的整数是31的倍数
+        if self.encoding == 'deflate' and not (data[0] & 0x0F == 8 and (data[0] << 8 | data[1]) % 31 == 0):
+            wbits = -zlib.MAX_WBITS
+        self.decompressor = zlib.decompressobj(wbits)
+
+    def _fill(self):
+        """
+        解压一块数据到缓冲区
+        """
+        if self.decompressor and self.decompressor.eof:
+            # gzip允许多个成员(member)首尾相接 例如分段压缩后拼接的请求体 每个成员都需要新的解压器
+            # 结束之后剩余的数据在unused_data中 此时unconsumed_tail不再有意义
+            data = self.decompressor.unused_data or self.stream.read(self.chunk_size)
+            if not data:
+                self.eof = True
+                return
+            if self.encoding == 'deflate':
+                self.eof = True
+                raise ParseException(f'Unexpected data after the end of the {self.encoding} request body')
+            self.decompressor = zlib.decompressobj(self.encodings[self.encoding])
+        else:
+            data = self.decompressor.unconsumed_tail if self.decompressor else b''
+        if not data:
+            data = self.stream.read(self.chunk_size)
+            if self.decompressor is None:
+                # 至少需要两个字节才能判断deflate的格式
+                while data and len(data) < 2:
+                    more = self.stream.read(self.chunk_size)
+                    if not more:
+                        break
+                    data += more
+                if len(data) >= 2:
+                    self._create_decompressor(data)
+            if not data or self.decompressor is None:
+                self.eof = True
+                if data or (self.decompressor and not self.decompressor.eof):
+                    raise ParseException(f'Incomplete {self.encoding} request body')
+                return
+        try:
+            chunk = self.decompressor.decompress(data, self.chunk_size)
+        except zlib.error as e:
+            raise ParseException(f'Invalid {self.encoding} request body: {e}')
+        self.position += len(chunk)
+        if self.max_size and self.position > self.max_size:
+            raise ParseSizeException(f'The decompressed request body exceeds the limit of {self.max_size} bytes')
+        self.buffer += chunk
+
+    def read(self, size: t.Optional[int] = -1) -> bytes:
+        if size is None or size < 0:
+            while not self.eof:
+                self._fill()
+            size = len(self.buffer)
+        while len(self.buffer) < size and not self.eof:
+            self._fill()
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+        return data
+
+    def readall(self) -> bytes:
+        return self.read()
+
+    def readinto(self, buffer) -> int:
+        data = self.read(len(buffer))
+        buffer[:len(data)] = data
+        return len(data)
+
+    def iter_chunks(self, chunk_size: t.Optional[int] = None) -> t.Iterator[bytes]:
+        """
+        按chunk_size逐块读取解压后的请求体
+        """
+        chunk_size = chunk_size or self.chunk_size
+        while True:
+            chunk = self.read(chunk_size)
+            if not chunk:
+                return
+            yield chunk
+
+    def __iter__(self):
+        return self.iter_chunks()
+
+    def __next__(self):
+        chunk = self.read(self.chunk_size)
+        if not chunk:
+            raise StopIteration
+        return chunk